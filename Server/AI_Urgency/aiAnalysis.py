@@ -1,21 +1,107 @@
 """
 AI-based Medical Urgency Analyzer
 Uses transformer models to analyze patient symptoms and determine urgency
+
+Usage (from Server/AI_Urgency; Server/ must be on PYTHONPATH for ml.metrics,
+which urgencyAnalyzer.js and benchmark.py set when they start the worker):
+    PYTHONPATH=.. python aiAnalysis.py "<transcript>"   one-shot analysis, prints one JSON result
+    PYTHONPATH=.. python aiAnalysis.py --serve          long-running worker speaking NDJSON on stdin/stdout
+
+In server mode the model is loaded once and every input line is a request:
+    {"id": 1, "transcript": "..."}   ->  {"id": 1, "result": {...}}
+    {"id": 2, "op": "health"}        ->  {"id": 2, "result": {"status": "ok", ...}}
+    {"id": 3, "op": "feed", "session": "s1", "delta": "..."}
+                                     ->  {"id": 3, "result": {...}}  for the transcript so far
+    {"id": 4, "op": "end", "session": "s1"}   ->  last result of the session
+    {"id": 5, "op": "metrics"}       ->  stage and request latency histograms
+                                         (Prometheus text format) as the result
+Send the next delta of a session after the previous feed has been answered.
+Queued requests are classified together in batches and responses may come
+back out of order.
 """
 
-from transformers import pipeline
 import json
-import sys
+import os
+import queue
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from symptomMatcher import LEXICON_PATH, SymptomMatcher
+from urgencyBackends import BACKEND, MODEL, load_classifier
+
+# Latency histograms and their Prometheus text format, shared with the Flask ML server
+from ml.metrics import Registry
+
+# Define urgency categories
+URGENCY_LABELS = [
+    "life-threatening emergency requiring immediate medical attention",
+    "serious medical condition requiring urgent care",
+    "moderate health concern requiring medical consultation",
+    "mild symptoms that can wait for routine care",
+    "general health inquiry or non-urgent matter"
+]
+
+# Transcripts classified per forward pass by analyze_batch
+BATCH_SIZE = int(os.environ.get('URGENCY_BATCH_SIZE', '8'))
+
+# Cascade: let the keyword stage decide transcripts with this many decisive
+# emergency phrases (the lexicon's "decisive" list, e.g. "not breathing") and
+# send everything else to the model (URGENCY_CASCADE=0 disables it)
+CASCADE = os.environ.get('URGENCY_CASCADE', '1') == '1'
+CASCADE_MIN_CRITICAL = int(os.environ.get('URGENCY_CASCADE_MIN_CRITICAL', '1'))
+
+# Long transcripts are scored in overlapping windows of WINDOW_TOKENS tokens,
+# WINDOW_STRIDE apart, instead of being truncated at the model's max length.
+# AGGREGATION combines the windows: 'max' lets the most urgent window decide,
+# 'weighted' averages the label scores weighted by window length.
+WINDOW_TOKENS = int(os.environ.get('URGENCY_WINDOW_TOKENS', '256'))
+WINDOW_STRIDE = int(os.environ.get('URGENCY_WINDOW_STRIDE', '192'))
+AGGREGATION = os.environ.get('URGENCY_AGGREGATION', 'max')
+AGGREGATIONS = ('max', 'weighted')
+
+# Streaming sessions not fed for SESSION_TTL seconds are dropped, and at most
+# MAX_SESSIONS are kept (least recently fed first out), in case a client
+# never sends 'end'
+SESSION_TTL = float(os.environ.get('URGENCY_SESSION_TTL', '600'))
+MAX_SESSIONS = int(os.environ.get('URGENCY_MAX_SESSIONS', '1000'))
+
+# Values of the triageTier field, i.e. which stage decided the result
+TRIAGE_TIERS = ('empty', 'keyword', 'model', 'fallback')
+
 
 class MedicalUrgencyAnalyzer:
-    def __init__(self):
+    def __init__(self, cascade=CASCADE, cascade_min_critical=CASCADE_MIN_CRITICAL, lexicon_path=LEXICON_PATH,
+                 window_tokens=WINDOW_TOKENS, window_stride=WINDOW_STRIDE, aggregation=AGGREGATION,
+                 backend=BACKEND, model=MODEL):
         """Initialize the AI model for text classification"""
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f'aggregation must be one of {AGGREGATIONS}, got {aggregation!r}')
+        if not 0 < window_stride <= window_tokens:
+            raise ValueError('window_stride must be between 1 and window_tokens')
+        self.lexicon = SymptomMatcher.load(lexicon_path)
+        self.window_tokens = window_tokens
+        self.window_stride = window_stride
+        self.aggregation = aggregation
+        self.cascade = cascade
+        self.cascade_min_critical = cascade_min_critical
+        self.tier_counts = dict.fromkeys(TRIAGE_TIERS, 0)
+        self.tier_lock = threading.Lock()
+        # The fast tokenizer is not thread-safe ("Already borrowed" when two
+        # threads change its truncation settings), so the classifier and its
+        # tokenizer are used by one thread at a time
+        self.classifier_lock = threading.Lock()
+        self.metrics = Registry()
+        self.stage_seconds = self.metrics.histogram(
+            'urgency_stage_seconds', 'Time spent in each stage of an urgency analysis', ('stage',))
+        self.backend = backend
+        self.model_name = model
         try:
-            # Using a general text classification model
-            # You can replace this with a medical-specific model if available
-            self.classifier = pipeline("zero-shot-classification", 
-                                      model="facebook/bart-large-mnli")
+            # facebook/bart-large-mnli by default; URGENCY_MODEL and
+            # URGENCY_BACKEND select a smaller, quantized or ONNX model
+            self.classifier = load_classifier(URGENCY_LABELS, backend, model)
         except Exception as e:
             print(f"Error loading model: {e}", file=sys.stderr)
             self.classifier = None
@@ -25,162 +111,242 @@ class MedicalUrgencyAnalyzer:
         Analyze medical urgency from patient transcript
         Returns urgency score (0-10) and detected symptoms
         """
-        if not transcript or len(transcript.strip()) == 0:
-            return {
-                'urgencyScore': 0,
-                'urgencyRank': 3,
-                'severity': 'low',
-                'detectedSymptoms': [],
-                'recommendation': 'No symptoms described',
-                'confidence': 0
-            }
-        
-        # Define urgency categories
-        urgency_labels = [
-            "life-threatening emergency requiring immediate medical attention",
-            "serious medical condition requiring urgent care",
-            "moderate health concern requiring medical consultation",
-            "mild symptoms that can wait for routine care",
-            "general health inquiry or non-urgent matter"
-        ]
-        
-        try:
-            # Classify the urgency level
-            result = self.classifier(transcript, urgency_labels)
-            
-            # Get the top prediction
-            top_label = result['labels'][0]
-            confidence = result['scores'][0]
-            
-            # Map to urgency score (0-10)
-            if "life-threatening" in top_label:
-                urgency_score = 9 + (confidence * 1)  # 9-10
-                urgency_rank = 1
-                severity = "critical"
-            elif "serious medical" in top_label:
-                urgency_score = 7 + (confidence * 2)  # 7-9
-                urgency_rank = 1
-                severity = "high"
-            elif "moderate health" in top_label:
-                urgency_score = 4 + (confidence * 3)  # 4-7
-                urgency_rank = 2
-                severity = "medium"
-            elif "mild symptoms" in top_label:
-                urgency_score = 1 + (confidence * 3)  # 1-4
-                urgency_rank = 3
-                severity = "low"
+        return self.analyze_batch([transcript])[0]
+
+    def analyze_batch(self, transcripts, batch_size=BATCH_SIZE):
+        """
+        Analyze many transcripts together, results in input order.
+        Transcripts the keyword stage decides skip the model; the rest are
+        split into windows, and all windows are sorted by token length and
+        classified batch_size at a time, so each forward pass only pads to
+        similar-length inputs.
+        """
+        results = [None] * len(transcripts)
+        tiers = [None] * len(transcripts)
+        units = []
+        for index, transcript in enumerate(transcripts):
+            results[index], tiers[index] = self._before_model(transcript)
+            if results[index] is None:
+                units.extend((index, start, end, n_tokens) for start, end, n_tokens in self._windows(transcript))
+
+        units.sort(key=lambda unit: unit[3])
+        windows = {}
+        failed = set()
+        for start in range(0, len(units), batch_size):
+            chunk = units[start:start + batch_size]
+            try:
+                scores = self._classify([transcripts[index][a:b] for index, a, b, _ in chunk])
+            except Exception as e:
+                print(f"Error in AI analysis: {e}", file=sys.stderr)
+                failed.update(index for index, _, _, _ in chunk)
+                continue
+            for (index, a, _, n_tokens), window_scores in zip(chunk, scores):
+                windows.setdefault(index, []).append((a, n_tokens, window_scores))
+
+        for index, transcript in enumerate(transcripts):
+            if tiers[index] is not None:
+                continue
+            if index in failed:
+                # Fallback to keyword-based analysis
+                results[index], tiers[index] = self._fallback_analysis(transcript), 'fallback'
             else:
-                urgency_score = 0 + (confidence * 1)  # 0-1
-                urgency_rank = 3
-                severity = "minimal"
-            
-            # Detect specific medical keywords
-            detected_symptoms = self._detect_symptoms(transcript)
-            
-            # Generate recommendation
-            recommendation = self._generate_recommendation(urgency_score, detected_symptoms)
-            
-            return {
-                'urgencyScore': round(urgency_score, 2),
-                'urgencyRank': urgency_rank,
-                'severity': severity,
-                'detectedSymptoms': detected_symptoms,
-                'recommendation': recommendation,
-                'confidence': round(confidence * 100, 2),
-                'aiClassification': top_label
-            }
-            
-        except Exception as e:
-            print(f"Error in AI analysis: {e}", file=sys.stderr)
-            # Fallback to keyword-based analysis
-            return self._fallback_analysis(transcript)
-    
-    def _detect_symptoms(self, transcript):
-        """Detect medical symptoms from transcript"""
-        transcript_lower = transcript.lower()
-        
-        # Critical symptoms
-        critical_symptoms = {
-            'chest pain': ['chest pain', 'chest pressure', 'crushing chest', 'heart pain'],
-            'breathing difficulty': ['can\'t breathe', 'difficulty breathing', 'shortness of breath', 'gasping'],
-            'stroke symptoms': ['stroke', 'paralysis', 'face drooping', 'arm weakness', 'slurred speech'],
-            'severe bleeding': ['severe bleeding', 'heavy bleeding', 'blood loss', 'hemorrhage'],
-            'unconscious': ['unconscious', 'passed out', 'fainting', 'collapsed'],
-            'heart attack': ['heart attack', 'cardiac arrest', 'heart stopped'],
-            'seizure': ['seizure', 'convulsion', 'epileptic']
+                results[index], tiers[index] = self._aggregate_result(transcript, sorted(windows[index])), 'model'
+
+        self._record_tiers(results, tiers)
+        return results
+
+    def stream(self):
+        """Start an incremental analysis fed with transcript deltas"""
+        return UrgencyStream(self)
+
+    def _before_model(self, transcript):
+        """(result, tier) when no model pass is needed, else (None, None)"""
+        if not transcript or len(transcript.strip()) == 0:
+            return self._empty_result(), 'empty'
+        if self.cascade:
+            result = self._keyword_triage(transcript)
+            if result is not None:
+                return result, 'keyword'
+        return None, None
+
+    def _classify(self, texts):
+        """Label -> score dict for each text"""
+        # One call runs len(texts) * len(labels) NLI pairs in a single padded batch
+        with self.classifier_lock, self.stage_seconds.time('classify'):
+            outputs = self.classifier(texts, URGENCY_LABELS, batch_size=len(texts) * len(URGENCY_LABELS))
+        if isinstance(outputs, dict):
+            outputs = [outputs]
+        return [dict(zip(output['labels'], output['scores'])) for output in outputs]
+
+    def _record_tiers(self, results, tiers):
+        with self.tier_lock:
+            for result, tier in zip(results, tiers):
+                result['triageTier'] = tier
+                self.tier_counts[tier] += 1
+
+    def _token_spans(self, text):
+        """(start, end) character offsets of each token, or of each word without a fast tokenizer"""
+        tokenizer = getattr(self.classifier, 'tokenizer', None)
+        if tokenizer is not None and getattr(tokenizer, 'is_fast', False):
+            with self.classifier_lock:
+                encoding = tokenizer(text, add_special_tokens=False, truncation=False,
+                                     return_offsets_mapping=True, verbose=False)
+            return encoding['offset_mapping']
+        return [match.span() for match in re.finditer(r'\S+', text)]
+
+    def _windows(self, text):
+        """(start, end, n_tokens) of each window; a short text is one window over all of it"""
+        with self.stage_seconds.time('windows'):
+            spans = self._token_spans(text)
+        if len(spans) <= self.window_tokens:
+            return [(0, len(text), len(spans))]
+        windows = []
+        for first in range(0, len(spans), self.window_stride):
+            last = min(first + self.window_tokens, len(spans))
+            windows.append((spans[first][0], spans[last - 1][1], last - first))
+            if last == len(spans):
+                break
+        return windows
+
+    def _aggregate_result(self, transcript, windows):
+        """Urgency result from the (start, n_tokens, scores) of every window of a transcript"""
+        if len(windows) == 1:
+            scores = windows[0][2]
+        elif self.aggregation == 'weighted':
+            total = sum(n_tokens for _, n_tokens, _ in windows)
+            scores = {label: sum(n_tokens * window_scores[label] for _, n_tokens, window_scores in windows) / total
+                      for label in URGENCY_LABELS}
+        else:
+            # The most urgent window decides
+            scores = max((window_scores for _, _, window_scores in windows),
+                         key=lambda window_scores: self._label_urgency(*self._top(window_scores))[0])
+        result = self._classification_result(transcript, *self._top(scores))
+        if len(windows) > 1:
+            result['windows'] = len(windows)
+        return result
+
+    @staticmethod
+    def _top(scores):
+        label = max(scores, key=scores.get)
+        return label, scores[label]
+
+    def _keyword_triage(self, transcript):
+        """
+        Result for transcripts with unambiguous emergency phrases, or None
+        when the model has to decide
+        """
+        with self.stage_seconds.time('detect_symptoms'):
+            matches = self.lexicon.find(transcript)
+        decisive = self.lexicon.decisive(matches)
+        if not decisive or len(decisive) < self.cascade_min_critical:
+            return None
+        detected_symptoms = self.lexicon.symptoms(matches)
+        urgency_score = min(9 + 0.5 * (len(decisive) - 1), 10)  # 9-10, like the model's top label
+        return {
+            'urgencyScore': round(urgency_score, 2),
+            'urgencyRank': 1,
+            'severity': 'critical',
+            'detectedSymptoms': detected_symptoms,
+            'recommendation': self._generate_recommendation(urgency_score, detected_symptoms),
+            'confidence': 100,
+            'aiClassification': f"Keyword triage: {', '.join(decisive)}"
         }
-        
-        # Serious symptoms
-        serious_symptoms = {
-            'severe pain': ['severe pain', 'excruciating', 'unbearable pain', 'intense pain'],
-            'high fever': ['high fever', 'burning up', 'very hot', 'temperature'],
-            'vomiting blood': ['vomiting blood', 'blood in vomit', 'throwing up blood'],
-            'head injury': ['head injury', 'hit my head', 'head trauma', 'concussion'],
-            'broken bone': ['broken bone', 'fracture', 'snapped', 'bone broke']
+
+    def tier_stats(self):
+        """How many transcripts each triage tier decided, and its share of the total"""
+        with self.tier_lock:
+            counts = dict(self.tier_counts)
+        total = sum(counts.values())
+        return {
+            'total': total,
+            'counts': counts,
+            'shares': {tier: round(count / total, 4) if total else 0 for tier, count in counts.items()}
         }
-        
-        # Moderate symptoms
-        moderate_symptoms = {
-            'pain': ['pain', 'hurts', 'ache', 'sore'],
-            'fever': ['fever', 'temperature', 'chills'],
-            'cough': ['cough', 'coughing'],
-            'nausea': ['nausea', 'sick', 'queasy'],
-            'headache': ['headache', 'head hurts', 'migraine']
+
+    def _empty_result(self):
+        return {
+            'urgencyScore': 0,
+            'urgencyRank': 3,
+            'severity': 'low',
+            'detectedSymptoms': [],
+            'recommendation': 'No symptoms described',
+            'confidence': 0
+        }
+
+    def _label_urgency(self, top_label, confidence):
+        """(urgency_score, urgency_rank, severity) for the top zero-shot label and its score"""
+        # Map to urgency score (0-10)
+        if "life-threatening" in top_label:
+            urgency_score = 9 + (confidence * 1)  # 9-10
+            urgency_rank = 1
+            severity = "critical"
+        elif "serious medical" in top_label:
+            urgency_score = 7 + (confidence * 2)  # 7-9
+            urgency_rank = 1
+            severity = "high"
+        elif "moderate health" in top_label:
+            urgency_score = 4 + (confidence * 3)  # 4-7
+            urgency_rank = 2
+            severity = "medium"
+        elif "mild symptoms" in top_label:
+            urgency_score = 1 + (confidence * 3)  # 1-4
+            urgency_rank = 3
+            severity = "low"
+        else:
+            urgency_score = 0 + (confidence * 1)  # 0-1
+            urgency_rank = 3
+            severity = "minimal"
+        return urgency_score, urgency_rank, severity
+
+    def _classification_result(self, transcript, top_label, confidence):
+        """Map the top zero-shot label and its score to the urgency result"""
+        urgency_score, urgency_rank, severity = self._label_urgency(top_label, confidence)
+
+        # Detect specific medical keywords
+        detected_symptoms = self._detect_symptoms(transcript)
+
+        # Generate recommendation
+        recommendation = self._generate_recommendation(urgency_score, detected_symptoms)
+
+        return {
+            'urgencyScore': round(urgency_score, 2),
+            'urgencyRank': urgency_rank,
+            'severity': severity,
+            'detectedSymptoms': detected_symptoms,
+            'recommendation': recommendation,
+            'confidence': round(confidence * 100, 2),
+            'aiClassification': top_label
         }
-        
-        detected = []
-        
-        # Check critical first
-        for symptom, keywords in critical_symptoms.items():
-            if any(keyword in transcript_lower for keyword in keywords):
-                detected.append({'symptom': symptom, 'severity': 'critical'})
-        
-        # Check serious
-        for symptom, keywords in serious_symptoms.items():
-            if any(keyword in transcript_lower for keyword in keywords):
-                detected.append({'symptom': symptom, 'severity': 'serious'})
-        
-        # Check moderate
-        for symptom, keywords in moderate_symptoms.items():
-            if any(keyword in transcript_lower for keyword in keywords):
-                if not any(d['symptom'] == symptom for d in detected):  # Avoid duplicates
-                    detected.append({'symptom': symptom, 'severity': 'moderate'})
-        
-        return detected
+    
+    def _detect_symptoms(self, transcript):
+        """Detect medical symptoms (with their spans) from transcript, ignoring negated mentions"""
+        with self.stage_seconds.time('detect_symptoms'):
+            return self.lexicon.symptoms(self.lexicon.find(transcript))
     
     def _generate_recommendation(self, urgency_score, symptoms):
         """Generate medical recommendation based on urgency"""
-        if urgency_score >= 8:
-            return "CALL 911 IMMEDIATELY - This requires emergency medical attention"
-        elif urgency_score >= 6:
-            return "Seek urgent care immediately - Visit emergency room or urgent care clinic"
-        elif urgency_score >= 4:
-            return "Schedule medical consultation soon - Contact your doctor within 24-48 hours"
-        elif urgency_score >= 2:
-            return "Monitor symptoms - Schedule routine appointment if symptoms persist"
-        else:
-            return "General health inquiry - No immediate medical attention required"
+        with self.stage_seconds.time('recommend'):
+            if urgency_score >= 8:
+                return "CALL 911 IMMEDIATELY - This requires emergency medical attention"
+            elif urgency_score >= 6:
+                return "Seek urgent care immediately - Visit emergency room or urgent care clinic"
+            elif urgency_score >= 4:
+                return "Schedule medical consultation soon - Contact your doctor within 24-48 hours"
+            elif urgency_score >= 2:
+                return "Monitor symptoms - Schedule routine appointment if symptoms persist"
+            else:
+                return "General health inquiry - No immediate medical attention required"
     
     def _fallback_analysis(self, transcript):
         """Fallback to simple keyword-based analysis if AI fails"""
-        transcript_lower = transcript.lower()
-        
-        # Critical keywords
-        critical_keywords = ['emergency', 'urgent', 'help', 'dying', 'heart attack', 'stroke', 
-                           'can\'t breathe', 'chest pain', 'bleeding', 'unconscious', 'seizure']
-        
-        # High priority keywords
-        high_keywords = ['severe', 'extreme', 'intense', 'bad', 'terrible', 'awful',
-                        'broken', 'accident', 'injury', 'blood']
-        
-        # Medium priority keywords
-        medium_keywords = ['pain', 'hurt', 'sick', 'fever', 'cough', 'vomiting',
-                          'dizzy', 'weak', 'tired']
+        with self.stage_seconds.time('detect_symptoms'):
+            matches = self.lexicon.find(transcript)
+            keywords = self.lexicon.urgency_keywords(matches)
         
         # Count keyword matches
-        critical_count = sum(1 for keyword in critical_keywords if keyword in transcript_lower)
-        high_count = sum(1 for keyword in high_keywords if keyword in transcript_lower)
-        medium_count = sum(1 for keyword in medium_keywords if keyword in transcript_lower)
+        critical_count = len(keywords['critical'])
+        high_count = len(keywords['high'])
+        medium_count = len(keywords['medium'])
         
         # Calculate urgency
         if critical_count > 0:
@@ -200,7 +366,8 @@ class MedicalUrgencyAnalyzer:
             urgency_rank = 3
             severity = "low"
         
-        detected_symptoms = self._detect_symptoms(transcript)
+        with self.stage_seconds.time('detect_symptoms'):
+            detected_symptoms = self.lexicon.symptoms(matches)
         
         return {
             'urgencyScore': round(urgency_score, 2),
@@ -213,8 +380,236 @@ class MedicalUrgencyAnalyzer:
         }
 
 
+class UrgencyStream:
+    """
+    Incremental analysis of a transcript that arrives in pieces, e.g. from
+    live speech-to-text. Each feed() re-scores only the windows that did not
+    exist at the previous call (new text and the window covering the tail),
+    so a critical case can be flagged while the patient is still speaking.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.text = ''
+        self.scored = {}
+        self.result = None
+        self.lock = threading.Lock()
+
+    def feed(self, delta):
+        """Append `delta` and return the urgency result for the text so far"""
+        with self.lock:
+            self.text += delta
+            analyzer = self.analyzer
+            result, tier = analyzer._before_model(self.text)
+            new = []
+            if result is None:
+                windows = analyzer._windows(self.text)
+                new = [window for window in windows if window[:2] not in self.scored]
+                try:
+                    for start in range(0, len(new), BATCH_SIZE):
+                        chunk = new[start:start + BATCH_SIZE]
+                        scores = analyzer._classify([self.text[a:b] for a, b, _ in chunk])
+                        for (a, b, _), window_scores in zip(chunk, scores):
+                            self.scored[(a, b)] = window_scores
+                    # Windows the tail has grown past are never needed again
+                    self.scored = {window[:2]: self.scored[window[:2]] for window in windows}
+                    result, tier = analyzer._aggregate_result(
+                        self.text, [(a, n_tokens, self.scored[(a, b)]) for a, b, n_tokens in windows]), 'model'
+                except Exception as e:
+                    print(f"Error in AI analysis: {e}", file=sys.stderr)
+                    result, tier = analyzer._fallback_analysis(self.text), 'fallback'
+            analyzer._record_tiers([result], [tier])
+            result['newWindows'] = len(new)
+            self.result = result
+            return result
+
+
+class UrgencyServer:
+    """
+    NDJSON request loop around one shared MedicalUrgencyAnalyzer.
+    Worker threads take every analyze request queued so far (up to
+    BATCH_SIZE) and run them through analyze_batch together; the analyzer's
+    classifier_lock keeps them from using the model at the same time.
+    """
+
+    def __init__(self, analyzer, workers=2, output=sys.stdout, batch_size=BATCH_SIZE,
+                 session_ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.analyzer = analyzer
+        self.output = output
+        self.batch_size = batch_size
+        self.requests = queue.Queue()
+        self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        self.write_lock = threading.Lock()
+        self.started = time.time()
+        self.processed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.batches = 0
+        # session -> (UrgencyStream, last feed time), least recently fed first
+        self.sessions = OrderedDict()
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.sessions_expired = 0
+        self.counter_lock = threading.Lock()
+        self.request_seconds = analyzer.metrics.histogram(
+            'urgency_request_seconds', 'Time from receiving a request to answering it, queueing included', ('op',))
+
+    def _send(self, message):
+        line = json.dumps(message)
+        with self.write_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'modelLoaded': self.analyzer.classifier is not None,
+            'backend': self.analyzer.backend,
+            'model': self.analyzer.model_name,
+            'uptimeSeconds': round(time.time() - self.started, 1),
+            'processed': self.processed,
+            'failed': self.failed,
+            'inFlight': self.in_flight,
+            'batches': self.batches,
+            'sessions': len(self.sessions),
+            'sessionsExpired': self.sessions_expired,
+            'tiers': self.analyzer.tier_stats(),
+            'stages': self.analyzer.stage_seconds.summary(),
+            'pid': os.getpid()
+        }
+
+    def _next_batch(self):
+        """Block for one request, then take whatever else is already queued"""
+        first = self.requests.get()
+        if first is None:
+            # Pass the stop marker on to the next worker
+            self.requests.put(None)
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Put the stop marker back for the next _next_batch call
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _respond(self, request_ids, compute):
+        """Send each result of compute() to its request, or the error to all of them"""
+        try:
+            results = compute()
+            for request_id, result in zip(request_ids, results):
+                self._send({'id': request_id, 'result': result})
+            with self.counter_lock:
+                self.processed += len(request_ids)
+        except Exception as e:
+            for request_id in request_ids:
+                self._send({'id': request_id, 'error': str(e)})
+            with self.counter_lock:
+                self.failed += len(request_ids)
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                analyses = [(request_id, text) for request_id, text, stream, _ in batch if stream is None]
+                if analyses:
+                    self._respond([request_id for request_id, _ in analyses],
+                                  lambda: self.analyzer.analyze_batch([text for _, text in analyses]))
+                for request_id, delta, stream, _ in batch:
+                    if stream is not None:
+                        self._respond([request_id], lambda: [stream.feed(delta)])
+            finally:
+                now = time.perf_counter()
+                for _, _, stream, received in batch:
+                    self.request_seconds.observe(now - received, 'analyze' if stream is None else 'feed')
+                with self.counter_lock:
+                    self.in_flight -= len(batch)
+                    self.batches += 1
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self._send({'id': None, 'error': f'Invalid JSON: {e}'})
+            return
+        request_id = request.get('id')
+        op = request.get('op', 'analyze')
+
+        if op == 'health':
+            self._send({'id': request_id, 'result': self.health()})
+        elif op == 'metrics':
+            self._send({'id': request_id, 'result': self.analyzer.metrics.exposition()})
+        elif op == 'analyze':
+            if not isinstance(request.get('transcript'), str):
+                self._send({'id': request_id, 'error': 'No transcript provided'})
+                return
+            self._enqueue(request_id, request['transcript'])
+        elif op == 'feed':
+            if not isinstance(request.get('delta'), str) or request.get('session') is None:
+                self._send({'id': request_id, 'error': 'feed needs a session and a delta'})
+                return
+            self._enqueue(request_id, request['delta'], self._session(request['session']))
+        elif op == 'end':
+            stream, _ = self.sessions.pop(request.get('session'), (None, None))
+            self._send({'id': request_id, 'result': stream.result if stream else None})
+        else:
+            self._send({'id': request_id, 'error': f'Unknown op: {op}'})
+
+    def _session(self, session):
+        """The session's stream, created if needed; drops expired and excess sessions"""
+        now = time.monotonic()
+        stream, _ = self.sessions.pop(session, (None, None))
+        while self.sessions:
+            oldest, (_, last_fed) = next(iter(self.sessions.items()))
+            if now - last_fed <= self.session_ttl and len(self.sessions) < self.max_sessions:
+                break
+            del self.sessions[oldest]
+            self.sessions_expired += 1
+        if stream is None:
+            stream = self.analyzer.stream()
+        self.sessions[session] = (stream, now)
+        return stream
+
+    def _enqueue(self, request_id, text, stream=None):
+        with self.counter_lock:
+            self.in_flight += 1
+        self.requests.put((request_id, text, stream, time.perf_counter()))
+
+    def serve_forever(self, lines=sys.stdin):
+        for worker in self.workers:
+            worker.start()
+        # Tell the parent the model is loaded and requests can be sent
+        self._send({'id': None, 'event': 'ready', 'result': self.health()})
+        for line in lines:
+            line = line.strip()
+            if line:
+                self.handle_line(line)
+        # stdin closed: finish queued requests, then exit
+        self.requests.put(None)
+        for worker in self.workers:
+            worker.join()
+
+
+def serve():
+    """Long-running worker: load the model once and answer NDJSON requests"""
+    workers = int(os.environ.get('URGENCY_WORKERS', '2'))
+    analyzer = MedicalUrgencyAnalyzer()
+    UrgencyServer(analyzer, workers=workers).serve_forever()
+
+
 def main():
     """Main function to analyze urgency from command line"""
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve()
+        return
+
     if len(sys.argv) < 2:
         print(json.dumps({'error': 'No transcript provided'}))
         sys.exit(1)
@@ -0,0 +1,145 @@
+"""
+Compare urgency classifier backends on a fixed transcript set.
+
+Each backend runs in its own process, so load time and memory are measured
+from a clean start. Agreement is the share of transcripts that land in the
+same severity bucket (and urgency rank) as the first backend listed, which
+should be the current production model.
+
+Usage (from Server/AI_Urgency):
+    PYTHONPATH=.. python benchmarkBackends.py \
+        transformers:facebook/bart-large-mnli \
+        quantized:facebook/bart-large-mnli \
+        onnx:./models/distilbart-mnli \
+        --json backends.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+
+TRANSCRIPTS = [
+    "My father collapsed and he is not breathing, I think it's cardiac arrest",
+    "I have crushing chest pressure spreading to my left arm and I'm sweating",
+    "She suddenly can't move her right side and her speech is slurred",
+    "There is blood everywhere, he cut his leg and it won't stop",
+    "My son had a seizure that lasted five minutes",
+    "I fell off a ladder and my wrist is bent the wrong way, the pain is unbearable",
+    "I've had a high fever of 104 for two days and I keep shivering",
+    "I hit my head in a car accident and now I feel confused and keep vomiting",
+    "I have been throwing up blood since this morning",
+    "My stomach has been hurting for three days and it's getting worse",
+    "I have a bad cough and a mild fever, it started last week",
+    "I sprained my ankle playing football, it's swollen and sore",
+    "I've had a headache on and off for a few days",
+    "My throat is a little sore and my nose is runny",
+    "I feel a bit tired lately and I'm not sleeping well",
+    "I have a small rash on my arm that itches",
+    "I'd like to renew my blood pressure prescription",
+    "Can I book a routine check-up for next month?",
+    "What are your opening hours on weekends?",
+    "I wanted to ask whether I need a flu shot this year",
+]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_backend(backend, model, repeat):
+    """Runs in a fresh process: load the backend and time every transcript"""
+    from aiAnalysis import MedicalUrgencyAnalyzer
+
+    baseline_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    # No keyword cascade: every transcript must go through the model
+    analyzer = MedicalUrgencyAnalyzer(cascade=False, backend=backend, model=model)
+    load_seconds = time.perf_counter() - start
+    if analyzer.classifier is None:
+        return {'backend': backend, 'model': model, 'error': 'model failed to load'}
+    analyzer.analyze_urgency(TRANSCRIPTS[0])
+
+    latencies = []
+    results = []
+    for _ in range(repeat):
+        results = []
+        for transcript in TRANSCRIPTS:
+            start = time.perf_counter()
+            results.append(analyzer.analyze_urgency(transcript))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    analyzer.analyze_batch(TRANSCRIPTS)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'backend': backend,
+        'model': model,
+        'load_seconds': round(load_seconds, 3),
+        'rss_mb': round(_peak_rss_mb() - baseline_rss, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+        'batch_transcripts_per_second': round(len(TRANSCRIPTS) / batch_seconds, 2),
+        # Transcripts the model failed on and the keyword fallback answered
+        'fallbacks': sum(result['triageTier'] == 'fallback' for result in results),
+        'severities': [result['severity'] for result in results],
+        'ranks': [result['urgencyRank'] for result in results],
+    }
+
+
+def _agreement(values, baseline):
+    return round(sum(a == b for a, b in zip(values, baseline)) / len(baseline), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency, memory and agreement of urgency classifier backends')
+    parser.add_argument('backends', nargs='+', metavar='BACKEND:MODEL',
+                        help='e.g. transformers:facebook/bart-large-mnli; the first one is the reference')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the transcript set')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    reports = []
+    for spec in args.backends:
+        backend, _, model = spec.partition(':')
+        print(f"⏳ {backend} {model}", file=sys.stderr)
+        with context.Pool(1) as pool:
+            reports.append(pool.apply(run_backend, (backend, model, args.repeat)))
+
+    reference = next((report for report in reports if 'error' not in report), None)
+    for report in reports:
+        if 'error' in report or reference is None:
+            continue
+        report['severity_agreement'] = _agreement(report['severities'], reference['severities'])
+        report['rank_agreement'] = _agreement(report['ranks'], reference['ranks'])
+
+    print(f"\n{'backend':<14}{'model':<36}{'load s':>8}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'batch/s':>9}{'severity':>10}{'rank':>7}{'fallbacks':>11}")
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['backend']:<14}{report['model']:<36}  ❌ {report['error']}")
+            continue
+        print(f"{report['backend']:<14}{report['model'][-35:]:<36}{report['load_seconds']:>8.2f}"
+              f"{report['rss_mb']:>9.0f}{report['p50_ms']:>9.1f}{report['p95_ms']:>9.1f}"
+              f"{report['batch_transcripts_per_second']:>9.2f}{report['severity_agreement']:>10.0%}"
+              f"{report['rank_agreement']:>7.0%}{report['fallbacks']:>11}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Compiled symptom lexicon.
+
+Every term in symptomLexicon.json is compiled once into a single regular
+expression shaped like a trie (shared prefixes are factored out), so one
+left-to-right scan finds all symptom and urgency-keyword matches with word
+boundaries, longest term first. Each match carries its span and whether a
+negation cue ("no", "denies", ...) precedes it in the same clause.
+Punctuation, conjunctions ("and", "but", ...) and interjections ("sure",
+"well", ...) end a clause, so neither "No, I can't breathe" nor "no sleep
+and chest pain" negates the symptom. Neither are pseudo-negations: cues inside a
+phrase such as "not sure", and comparisons such as "never had chest pain
+this bad".
+
+The "decisive" phrases are the only ones unambiguous enough for the keyword
+cascade in aiAnalysis.py to call a transcript critical without the model:
+a present emergency ("not breathing", "cardiac arrest"), not a symptom word
+that can also describe history or a condition ("stroke", "epileptic"). They
+are matched in a second pass, so "having a heart attack" does not hide the
+"heart attack" symptom and keyword inside it.
+"""
+
+from collections import namedtuple
+import json
+import os
+import re
+
+
+LEXICON_PATH = os.environ.get('URGENCY_LEXICON',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symptomLexicon.json'))
+# Sentences with the expected matcher output, checked by `python symptomMatcher.py`
+CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexiconCases.json')
+
+SEVERITY_ORDER = ('critical', 'serious', 'moderate')
+URGENCY_TIERS = ('critical', 'high', 'medium')
+
+# Characters of the lookbehind searched for a negation cue, and of the
+# lookahead searched for a comparison that makes it a pseudo-negation
+NEGATION_LOOKBEHIND = 80
+COMPARISON_LOOKAHEAD = 40
+
+LexiconMatch = namedtuple('LexiconMatch', 'term start end negated symptom severity urgency decisive')
+
+
+def normalize(term):
+    return re.sub(r"\s+", ' ', term.strip().lower().replace('’', "'"))
+
+
+def _char_pattern(char):
+    if char == ' ':
+        return r'\s+'
+    if char == "'":
+        return "['’]"
+    return re.escape(char)
+
+
+def trie_pattern(terms):
+    """Regex source matching any of `terms`, longest alternative first"""
+    root = {}
+    for term in terms:
+        node = root
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        alternatives = [_char_pattern(char) + build(child)
+                        for char, child in sorted(node.items()) if char != '']
+        if not alternatives:
+            return ''
+        if len(alternatives) == 1 and not terminal:
+            return alternatives[0]
+        group = '(?:' + '|'.join(alternatives) + ')'
+        return group + '?' if terminal else group
+
+    return build(root)
+
+
+class SymptomMatcher:
+    def __init__(self, lexicon):
+        self.entries = {}
+        self.symptom_order = {}
+        for position, item in enumerate(lexicon['symptoms']):
+            if item['severity'] not in SEVERITY_ORDER:
+                raise ValueError(f"Unknown severity {item['severity']!r} for {item['symptom']!r}")
+            self.symptom_order[item['symptom']] = position
+            for term in item['terms']:
+                self._add(normalize(term), 'symptom', (item['symptom'], item['severity']))
+        for tier, terms in lexicon.get('urgencyKeywords', {}).items():
+            if tier not in URGENCY_TIERS:
+                raise ValueError(f'Unknown urgency tier {tier!r}')
+            for term in terms:
+                self._add(normalize(term), 'urgency', tier)
+        self.decisive_terms = sorted({normalize(term) for term in lexicon.get('decisive', [])})
+
+        self.pattern = re.compile(
+            r"(?<![\w'])(?:" + trie_pattern(sorted(self.entries)) + r")(?![\w'])", re.IGNORECASE)
+        self.decisive_pattern = re.compile(
+            r"(?<![\w'])(?:" + trie_pattern(self.decisive_terms) + r")(?![\w'])",
+            re.IGNORECASE) if self.decisive_terms else None
+
+        negation = lexicon.get('negation', {})
+        cues = [normalize(cue) for cue in negation.get('cues', [])]
+        breaks = [normalize(word) for word in negation.get('clauseBreaks', [])]
+        pseudo = [normalize(phrase) for phrase in negation.get('pseudo', [])]
+        comparisons = [normalize(phrase) for phrase in negation.get('comparisons', [])]
+        window = int(negation.get('window', 3))
+        # A cue followed by at most `window` words up to the end of the lookbehind
+        self.negation = re.compile(
+            r"(?<![\w'])(?:" + trie_pattern(cues) + r")(?![\w'])(?:\W+[\w']+){0,%d}\W*$" % window,
+            re.IGNORECASE) if cues else None
+        self.clause_break = re.compile(
+            r"[.,;:!?]|(?<![\w'])(?:" + trie_pattern(breaks) + r")(?![\w'])" if breaks else r"[.,;:!?]",
+            re.IGNORECASE)
+        self.pseudo = re.compile(
+            r"(?<![\w'])(?:" + trie_pattern(pseudo) + r")(?![\w'])", re.IGNORECASE) if pseudo else None
+        # A comparison at most two words after the term, in the same clause
+        self.comparison = re.compile(
+            r"^(?:\s*[\w']+){0,2}\s*(?:" + trie_pattern(comparisons) + r")(?![\w'])",
+            re.IGNORECASE) if comparisons else None
+
+    def _add(self, term, role, value):
+        entry = self.entries.setdefault(term, {'symptom': None, 'urgency': None})
+        if entry[role] is not None and entry[role] != value:
+            raise ValueError(f'Lexicon term {term!r} is listed twice: {entry[role]} and {value}')
+        entry[role] = value
+
+    @classmethod
+    def load(cls, path=LEXICON_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _negated(self, text, start, end):
+        if self.negation is None:
+            return False
+        prefix = text[max(0, start - NEGATION_LOOKBEHIND):start]
+        # Skip a word cut in half by the lookbehind limit
+        clause_start = prefix.find(' ') + 1 if start > NEGATION_LOOKBEHIND else 0
+        for clause_break in self.clause_break.finditer(prefix):
+            clause_start = clause_break.end()
+        clause = prefix[clause_start:]
+        if self.pseudo is not None:
+            # Blank out "not sure" etc. so their cue doesn't count, keeping the word count
+            clause = self.pseudo.sub(lambda match: ' ' * len(match.group(0)), clause)
+        if self.negation.search(clause) is None:
+            return False
+        if self.comparison is not None:
+            suffix = text[end:end + COMPARISON_LOOKAHEAD]
+            clause_break = self.clause_break.search(suffix)
+            if self.comparison.search(suffix[:clause_break.start()] if clause_break else suffix):
+                return False
+        return True
+
+    def find(self, text):
+        """
+        Every lexicon term in `text` as LexiconMatch tuples, ordered by start;
+        decisive phrases come as separate matches that may overlap the others
+        """
+        matches = []
+        for match in self.pattern.finditer(text):
+            term = normalize(match.group(0))
+            entry = self.entries[term]
+            symptom, severity = entry['symptom'] or (None, None)
+            negated = self._negated(text, match.start(), match.end())
+            matches.append(LexiconMatch(term, match.start(), match.end(), negated,
+                                        symptom, severity, entry['urgency'], False))
+        if self.decisive_pattern is not None:
+            for match in self.decisive_pattern.finditer(text):
+                negated = self._negated(text, match.start(), match.end())
+                matches.append(LexiconMatch(normalize(match.group(0)), match.start(), match.end(), negated,
+                                            None, None, None, True))
+            matches.sort(key=lambda match: match.start)
+        return matches
+
+    def symptoms(self, matches):
+        """
+        Non-negated symptoms as [{'symptom', 'severity', 'spans'}], most severe
+        first and in lexicon order within a severity
+        """
+        found = {}
+        for match in matches:
+            if match.symptom is None or match.negated:
+                continue
+            item = found.setdefault(match.symptom, {'symptom': match.symptom, 'severity': match.severity, 'spans': []})
+            item['spans'].append([match.start, match.end])
+        return sorted(found.values(), key=lambda item: (SEVERITY_ORDER.index(item['severity']),
+                                                        self.symptom_order[item['symptom']]))
+
+    def decisive(self, matches):
+        """Distinct non-negated decisive emergency phrases found"""
+        found = []
+        for match in matches:
+            if match.decisive and not match.negated and match.term not in found:
+                found.append(match.term)
+        return found
+
+    def urgency_keywords(self, matches):
+        """Distinct non-negated urgency keywords found, per tier"""
+        found = {tier: [] for tier in URGENCY_TIERS}
+        for match in matches:
+            if match.urgency is not None and not match.negated and match.term not in found[match.urgency]:
+                found[match.urgency].append(match.term)
+        return found
+
+
+def check(matcher, cases):
+    """Failed expectations of `cases` as (text, field, expected, found) tuples"""
+    failures = []
+    for case in cases:
+        matches = matcher.find(case['text'])
+        found = {
+            'decisive': matcher.decisive(matches),
+            'symptoms': [item['symptom'] for item in matcher.symptoms(matches)],
+            'critical': matcher.urgency_keywords(matches)['critical'],
+        }
+        for field, value in found.items():
+            if field in case and sorted(case[field]) != sorted(value):
+                failures.append((case['text'], field, case[field], value))
+    return failures
+
+
+if __name__ == '__main__':
+    import sys
+
+    with open(CASES_PATH, encoding='utf-8') as f:
+        cases = json.load(f)
+    failures = check(SymptomMatcher.load(), cases)
+    for text, field, expected, found in failures:
+        print(f"❌ {text!r}: {field} {found}, expected {expected}")
+    print(f"{'❌' if failures else '✅'} {len(cases) - len({text for text, *_ in failures})}/{len(cases)} cases pass")
+    sys.exit(1 if failures else 0)
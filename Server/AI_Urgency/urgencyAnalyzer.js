@@ -4,101 +4,296 @@
  */
 
 const { spawn } = require('child_process');
+const fs = require('fs');
 const path = require('path');
+const readline = require('readline');
+
+// Path to Python script
+const pythonScript = path.join(__dirname, 'aiAnalysis.py');
+const serverDir = path.join(__dirname, '..');
+
+// Use the virtual environment Python
+const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python');
+
+// The first request waits for the model to load, so allow plenty of time
+const REQUEST_TIMEOUT_MS = parseInt(process.env.URGENCY_TIMEOUT_MS || '60000', 10);
+
+// Wait this long before respawning a worker that exited
+const RESTART_DELAY_MS = 5000;
+
+// A worker that times out this many requests in a row is assumed hung and killed
+const MAX_CONSECUTIVE_TIMEOUTS = parseInt(process.env.URGENCY_MAX_TIMEOUTS || '3', 10);
 
 /**
- * Analyze medical urgency using AI
- * @param {string} transcript - Patient's audio transcript
- * @returns {Promise<object>} - Urgency analysis result
+ * Long-running `aiAnalysis.py --serve` process shared by all requests.
+ * The model is loaded once; requests and responses are NDJSON lines
+ * matched by id, so many transcripts can be in flight at once.
  */
-async function analyzeUrgencyWithAI(transcript) {
-    return new Promise((resolve, reject) => {
-        // Path to Python script
-        const pythonScript = path.join(__dirname, 'aiAnalysis.py');
-        
-        // Use the virtual environment Python
-        const pythonPath = path.join(__dirname, '..', 'venv', 'bin', 'python');
-        
-        // Spawn Python process
-        const pythonProcess = spawn(pythonPath, [pythonScript, transcript]);
-        
-        let dataString = '';
-        let errorString = '';
-        
-        // Collect data from stdout
-        pythonProcess.stdout.on('data', (data) => {
-            dataString += data.toString();
+class UrgencyWorker {
+    constructor() {
+        this.process = null;
+        this.pending = new Map();
+        this.nextId = 1;
+        this.ready = false;
+        this.restartAt = 0;
+        this.timeouts = 0;
+    }
+
+    start() {
+        if (this.process) {
+            return true;
+        }
+        if (Date.now() < this.restartAt) {
+            return false;
+        }
+
+        const child = spawn(pythonPath, [pythonScript, '--serve'], {
+            stdio: ['pipe', 'pipe', 'pipe'],
+            // aiAnalysis.py imports the shared metrics from Server/ml
+            env: { ...process.env, PYTHONPATH: [serverDir, process.env.PYTHONPATH].filter(Boolean).join(path.delimiter) }
         });
-        
-        // Collect errors from stderr
-        pythonProcess.stderr.on('data', (data) => {
-            errorString += data.toString();
+        this.process = child;
+        this.ready = false;
+        this.timeouts = 0;
+
+        readline.createInterface({ input: child.stdout }).on('line', (line) => this.onLine(line));
+        child.stderr.on('data', (data) => {
+            console.error('Python AI worker:', data.toString().trim());
         });
-        
-        // Handle process completion
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                console.error('Python AI analysis error:', errorString);
-                // Fallback to hardcoded analysis
-                resolve(fallbackAnalysis(transcript));
-            } else {
-                try {
-                    const result = JSON.parse(dataString);
-                    resolve(result);
-                } catch (error) {
-                    console.error('Error parsing AI result:', error);
-                    resolve(fallbackAnalysis(transcript));
-                }
-            }
+        child.on('error', (error) => {
+            console.error('Failed to start Python AI worker:', error);
+            this.onExit(child);
         });
-        
-        // Handle process errors
-        pythonProcess.on('error', (error) => {
-            console.error('Failed to start Python process:', error);
-            resolve(fallbackAnalysis(transcript));
+        // Writing to a worker that is exiting fails with EPIPE; without a
+        // listener that error would be thrown and take the server down
+        child.stdin.on('error', (error) => {
+            console.error('Python AI worker input closed:', error.message);
+            child.kill();
+            this.onExit(child);
         });
-    });
+        child.on('close', (code) => {
+            console.error(`Python AI worker exited with code ${code}`);
+            this.onExit(child);
+        });
+        return true;
+    }
+
+    onLine(line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (error) {
+            console.error('Error parsing AI worker output:', line);
+            return;
+        }
+        if (message.event === 'ready') {
+            this.ready = true;
+            console.log('✅ Python AI worker ready');
+            return;
+        }
+        const request = this.pending.get(message.id);
+        if (!request) {
+            return;
+        }
+        this.pending.delete(message.id);
+        clearTimeout(request.timer);
+        this.timeouts = 0;
+        if (message.error) {
+            request.reject(new Error(message.error));
+        } else {
+            request.resolve(message.result);
+        }
+    }
+
+    onExit(child) {
+        if (this.process !== child) {
+            return;
+        }
+        this.process = null;
+        this.ready = false;
+        this.restartAt = Date.now() + RESTART_DELAY_MS;
+        for (const request of this.pending.values()) {
+            clearTimeout(request.timer);
+            request.reject(new Error('Python AI worker exited'));
+        }
+        this.pending.clear();
+    }
+
+    onTimeout(child) {
+        if (this.process !== child) {
+            return;
+        }
+        this.timeouts += 1;
+        if (this.timeouts >= MAX_CONSECUTIVE_TIMEOUTS) {
+            // Alive but not answering: kill it so the next request respawns it
+            console.error(`Python AI worker timed out ${this.timeouts} requests in a row, restarting it`);
+            child.kill('SIGKILL');
+            this.onExit(child);
+        }
+    }
+
+    send(message) {
+        return new Promise((resolve, reject) => {
+            if (!this.start()) {
+                reject(new Error('Python AI worker is restarting'));
+                return;
+            }
+            const id = this.nextId++;
+            const child = this.process;
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error('AI analysis timed out'));
+                this.onTimeout(child);
+            }, REQUEST_TIMEOUT_MS);
+            this.pending.set(id, { resolve, reject, timer });
+            child.stdin.write(JSON.stringify({ ...message, id }) + '\n');
+        });
+    }
+
+    stop() {
+        if (this.process) {
+            this.process.stdin.end();
+        }
+    }
+}
+
+const worker = new UrgencyWorker();
+
+/**
+ * Analyze medical urgency using AI
+ * @param {string} transcript - Patient's audio transcript
+ * @returns {Promise<object>} - Urgency analysis result
+ */
+async function analyzeUrgencyWithAI(transcript) {
+    try {
+        return await worker.send({ op: 'analyze', transcript });
+    } catch (error) {
+        console.error('Python AI analysis error:', error.message);
+        // Fallback to hardcoded analysis
+        return fallbackAnalysis(transcript);
+    }
+}
+
+/**
+ * Health of the Python AI worker (starts it if it isn't running)
+ * @returns {Promise<object>} - { status, modelLoaded, processed, inFlight, ... }
+ */
+async function checkAIHealth() {
+    try {
+        return await worker.send({ op: 'health' });
+    } catch (error) {
+        return { status: 'unavailable', error: error.message };
+    }
 }
 
 /**
- * Fallback analysis using hardcoded keyword matching
+ * Stage and request latency histograms of the Python AI worker
+ * @returns {Promise<string>} - Prometheus text format
+ */
+async function getAIMetrics() {
+    return worker.send({ op: 'metrics' });
+}
+
+/**
+ * Start the Python AI worker ahead of the first transcript
+ */
+function startAIWorker() {
+    worker.start();
+}
+
+process.on('exit', () => worker.stop());
+
+/**
+ * Symptom lexicon shared with aiAnalysis.py, compiled once into one regex.
+ * Terms are matched on word boundaries, longest first; a match is negated
+ * when a cue such as "no" or "denies" precedes it in the same clause.
+ * Punctuation, conjunctions ("and", "but", ...) and interjections ("sure",
+ * "well", ...) end a clause, and
+ * pseudo-negations ("not sure", "never had chest pain this bad") don't count,
+ * exactly as in symptomMatcher.py.
+ */
+const lexicon = JSON.parse(fs.readFileSync(
+    process.env.URGENCY_LEXICON || path.join(__dirname, 'symptomLexicon.json'), 'utf8'));
+
+// Characters before a match searched for a negation cue, and after it for a
+// comparison that makes it a pseudo-negation
+const NEGATION_LOOKBEHIND = 80;
+const COMPARISON_LOOKAHEAD = 40;
+
+function normalizeTerm(term) {
+    return term.trim().toLowerCase().replace(/\u2019/g, "'").replace(/\s+/g, ' ');
+}
+
+function termsPattern(terms) {
+    return [...terms]
+        .sort((a, b) => b.length - a.length)
+        .map(term => term.replace(/[.*+?^${}()|[\]\\]/g, '\\$&').replace(/ /g, '\\s+').replace(/'/g, "['\u2019]"))
+        .join('|');
+}
+
+const urgencyTerms = new Map();
+for (const [tier, terms] of Object.entries(lexicon.urgencyKeywords)) {
+    for (const term of terms) {
+        urgencyTerms.set(normalizeTerm(term), tier);
+    }
+}
+
+const keywordPattern = new RegExp(`(?<![\\w'])(?:${termsPattern(urgencyTerms.keys())})(?![\\w'])`, 'gi');
+const negationPattern = new RegExp(
+    `(?<![\\w'])(?:${termsPattern(lexicon.negation.cues.map(normalizeTerm))})(?![\\w'])` +
+    `(?:\\W+[\\w']+){0,${lexicon.negation.window}}\\W*$`, 'i');
+const clauseBreakPattern = new RegExp(
+    `[.,;:!?]|(?<![\\w'])(?:${termsPattern(lexicon.negation.clauseBreaks.map(normalizeTerm))})(?![\\w'])`, 'gi');
+const pseudoPattern = new RegExp(
+    `(?<![\\w'])(?:${termsPattern((lexicon.negation.pseudo || []).map(normalizeTerm))})(?![\\w'])`, 'gi');
+// A comparison at most two words after the term, in the same clause
+const comparisonPattern = new RegExp(
+    `^(?:\\s*[\\w']+){0,2}\\s*(?:${termsPattern((lexicon.negation.comparisons || []).map(normalizeTerm))})(?![\\w'])`,
+    'i');
+
+function isNegated(text, start, end) {
+    let prefix = text.slice(Math.max(0, start - NEGATION_LOOKBEHIND), start);
+    if (start > NEGATION_LOOKBEHIND) {
+        // Skip a word cut in half by the lookbehind limit
+        prefix = prefix.slice(prefix.indexOf(' ') + 1);
+    }
+    const clauses = prefix.split(clauseBreakPattern);
+    // Blank out "not sure" etc. so their cue doesn't count, keeping the word count
+    const clause = clauses[clauses.length - 1].replace(pseudoPattern, match => ' '.repeat(match.length));
+    if (!negationPattern.test(clause)) {
+        return false;
+    }
+    const suffix = text.slice(end, end + COMPARISON_LOOKAHEAD).split(clauseBreakPattern)[0];
+    return !comparisonPattern.test(suffix);
+}
+
+/**
+ * Distinct, non-negated urgency keywords in the transcript, per tier
+ * @param {string} transcript
+ * @returns {{critical: string[], high: string[], medium: string[]}}
+ */
+function findUrgencyKeywords(transcript) {
+    const found = { critical: [], high: [], medium: [] };
+    for (const match of transcript.matchAll(keywordPattern)) {
+        const term = normalizeTerm(match[0]);
+        const tier = urgencyTerms.get(term);
+        if (!found[tier].includes(term) && !isNegated(transcript, match.index, match.index + match[0].length)) {
+            found[tier].push(term);
+        }
+    }
+    return found;
+}
+
+/**
+ * Fallback analysis using the shared keyword lexicon
  * @param {string} transcript - Patient's audio transcript
  * @returns {object} - Urgency analysis result
  */
 function fallbackAnalysis(transcript) {
-    const lowerTranscript = transcript.toLowerCase();
-    
-    // Emergency keywords
-    const emergencyKeywords = [
-        'emergency', 'urgent', 'critical', 'dying', 'help me',
-        'heart attack', 'stroke', 'can\'t breathe', 'chest pain',
-        'severe bleeding', 'unconscious', 'seizure', 'collapsed'
-    ];
-    
-    // High priority keywords
-    const highPriorityKeywords = [
-        'severe', 'extreme', 'intense', 'unbearable', 'excruciating',
-        'broken', 'fracture', 'accident', 'injury', 'blood', 'vomiting blood'
-    ];
-    
-    // Medium priority keywords
-    const mediumPriorityKeywords = [
-        'pain', 'hurt', 'ache', 'sick', 'fever', 'cough',
-        'nausea', 'vomiting', 'dizzy', 'weak', 'tired'
-    ];
-    
-    // Count keyword matches
-    const emergencyCount = emergencyKeywords.filter(keyword => 
-        lowerTranscript.includes(keyword)
-    ).length;
-    
-    const highCount = highPriorityKeywords.filter(keyword => 
-        lowerTranscript.includes(keyword)
-    ).length;
-    
-    const mediumCount = mediumPriorityKeywords.filter(keyword => 
-        lowerTranscript.includes(keyword)
-    ).length;
+    const keywords = findUrgencyKeywords(transcript);
+    const emergencyCount = keywords.critical.length;
+    const highCount = keywords.high.length;
+    const mediumCount = keywords.medium.length;
     
     // Calculate urgency score
     let urgencyScore = 0;
@@ -110,17 +305,17 @@ function fallbackAnalysis(transcript) {
         urgencyScore = Math.min(8 + emergencyCount * 0.5, 10);
         urgencyRank = 1;
         severity = 'critical';
-        detectedKeywords = emergencyKeywords.filter(k => lowerTranscript.includes(k));
+        detectedKeywords = keywords.critical;
     } else if (highCount > 0) {
         urgencyScore = Math.min(5 + highCount * 0.5, 8);
         urgencyRank = 2;
         severity = 'high';
-        detectedKeywords = highPriorityKeywords.filter(k => lowerTranscript.includes(k));
+        detectedKeywords = keywords.high;
     } else if (mediumCount > 0) {
         urgencyScore = Math.min(2 + mediumCount * 0.3, 5);
         urgencyRank = 2;
         severity = 'medium';
-        detectedKeywords = mediumPriorityKeywords.filter(k => lowerTranscript.includes(k));
+        detectedKeywords = keywords.medium;
     } else {
         urgencyScore = 1;
         urgencyRank = 3;
@@ -154,7 +349,37 @@ function fallbackAnalysis(transcript) {
     };
 }
 
+/**
+ * Check the keyword matcher against lexiconCases.json (`node urgencyAnalyzer.js`)
+ * @returns {number} - failed cases
+ */
+function checkLexiconCases() {
+    const cases = JSON.parse(fs.readFileSync(path.join(__dirname, 'lexiconCases.json'), 'utf8'));
+    let failed = 0;
+    for (const testCase of cases) {
+        if (!testCase.critical) {
+            continue;
+        }
+        const found = findUrgencyKeywords(testCase.text).critical;
+        if ([...found].sort().join('|') !== [...testCase.critical].sort().join('|')) {
+            console.log(`❌ ${JSON.stringify(testCase.text)}: critical ${JSON.stringify(found)}, ` +
+                `expected ${JSON.stringify(testCase.critical)}`);
+            failed += 1;
+        }
+    }
+    console.log(`${failed ? '❌' : '✅'} ${cases.filter(c => c.critical).length - failed}/` +
+        `${cases.filter(c => c.critical).length} keyword cases pass`);
+    return failed;
+}
+
+if (require.main === module) {
+    process.exitCode = checkLexiconCases() ? 1 : 0;
+}
+
 module.exports = {
     analyzeUrgencyWithAI,
+    checkAIHealth,
+    getAIMetrics,
+    startAIWorker,
     fallbackAnalysis
 };
\ No newline at end of file
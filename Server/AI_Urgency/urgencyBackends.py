@@ -0,0 +1,139 @@
+"""
+Zero-shot classifier backends for MedicalUrgencyAnalyzer.
+
+Every backend returns a zero-shot-classification pipeline, or an object
+called the same way, so the analyzer code is the same whichever one is used:
+
+    transformers  the model as published (a hub name or a local directory)
+    quantized     the same model with its Linear layers dynamically quantized to int8
+    onnx          the model exported to ONNX and run by onnxruntime (needs optimum[onnxruntime])
+    embedding     one sentence-embedding pass per transcript, scored by cosine
+                  similarity to cached label + exemplar embeddings
+
+URGENCY_MODEL can point at a smaller distilled NLI model (or, for the
+embedding backend, a sentence-embedding model) saved locally, e.g. a
+directory written by `save_pretrained`.
+"""
+
+import json
+import os
+
+
+BACKEND = os.environ.get('URGENCY_BACKEND', 'transformers')
+DEFAULT_MODELS = {
+    'embedding': 'sentence-transformers/all-MiniLM-L6-v2',
+}
+MODEL = os.environ.get('URGENCY_MODEL') or DEFAULT_MODELS.get(BACKEND, 'facebook/bart-large-mnli')
+
+# Example transcripts per urgency label, embedded together with the label text
+EXEMPLARS_PATH = os.environ.get('URGENCY_EXEMPLARS',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'urgencyExemplars.json'))
+
+# Softmax temperature turning cosine similarities into label scores
+EMBEDDING_TEMPERATURE = float(os.environ.get('URGENCY_EMBEDDING_TEMPERATURE', '0.05'))
+
+
+def _pipeline(model, tokenizer=None):
+    from transformers import pipeline
+
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+def load_transformers(model, labels):
+    return _pipeline(model)
+
+
+def load_quantized(model, labels):
+    """int8 weights for every nn.Linear; activations are quantized on the fly"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    fp32 = AutoModelForSequenceClassification.from_pretrained(model)
+    int8 = torch.quantization.quantize_dynamic(fp32.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    return _pipeline(int8, AutoTokenizer.from_pretrained(model))
+
+
+def load_onnx(model, labels):
+    """Run an ONNX export of the model; a plain checkpoint is exported on first load"""
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    exported = os.path.isdir(model) and any(name.endswith('.onnx') for name in os.listdir(model))
+    onnx_model = ORTModelForSequenceClassification.from_pretrained(model, export=not exported)
+    return _pipeline(onnx_model, AutoTokenizer.from_pretrained(model))
+
+
+class EmbeddingClassifier:
+    """
+    Drop-in replacement for the zero-shot pipeline: a transcript is encoded
+    once (mean-pooled token embeddings) instead of once per label, and each
+    label is scored by cosine similarity to the normalized mean of its own
+    embedding and its exemplars' embeddings. Label vectors are computed once
+    per label set and cached.
+    """
+
+    def __init__(self, model, tokenizer, exemplars, temperature=EMBEDDING_TEMPERATURE):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.exemplars = exemplars
+        self.temperature = temperature
+        self.label_vectors = {}
+
+    def encode(self, texts):
+        """L2-normalized mean-pooled embeddings, one row per text"""
+        import torch
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors='pt')
+        with torch.inference_mode():
+            hidden = self.model(**encoded).last_hidden_state
+        mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, dim=-1)
+
+    def label_vectors_for(self, labels):
+        key = tuple(labels)
+        if key not in self.label_vectors:
+            import torch
+
+            vectors = [self.encode([label] + self.exemplars.get(label, [])).mean(dim=0) for label in labels]
+            self.label_vectors[key] = torch.nn.functional.normalize(torch.stack(vectors), dim=-1)
+        return self.label_vectors[key]
+
+    def __call__(self, texts, candidate_labels, batch_size=None):
+        """Same output as the zero-shot pipeline: labels sorted by score"""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        similarity = self.encode(texts) @ self.label_vectors_for(candidate_labels).T
+        scores = (similarity / self.temperature).softmax(dim=-1).tolist()
+        outputs = []
+        for text, row in zip(texts, scores):
+            ranked = sorted(zip(candidate_labels, row), key=lambda item: item[1], reverse=True)
+            outputs.append({'sequence': text, 'labels': [label for label, _ in ranked],
+                            'scores': [score for _, score in ranked]})
+        return outputs[0] if single else outputs
+
+
+def load_embedding(model, labels):
+    from transformers import AutoModel, AutoTokenizer
+
+    with open(EXEMPLARS_PATH, encoding='utf-8') as f:
+        exemplars = json.load(f)
+    classifier = EmbeddingClassifier(AutoModel.from_pretrained(model), AutoTokenizer.from_pretrained(model), exemplars)
+    # Embed the labels at startup rather than on the first transcript
+    classifier.label_vectors_for(labels)
+    return classifier
+
+
+BACKENDS = {
+    'transformers': load_transformers,
+    'quantized': load_quantized,
+    'onnx': load_onnx,
+    'embedding': load_embedding,
+}
+
+
+def load_classifier(labels, backend=BACKEND, model=MODEL):
+    """Classifier for `labels` (the urgency labels it will be asked to score)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown URGENCY_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend](model, labels)
@@ -1,16 +1,165 @@
-from flask import Flask, request, jsonify
+from ml import startup
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import os
 import pickle
+import sys
+import time
 import numpy as np
-import cv2
-import tensorflow as tf
-from joblib import load
+from ml import artifacts, bulk, imaging, memory, metrics, settings
+from ml.batching import MicroBatcher
+from ml.cache import PredictionCache
+from ml.compiled import LOAD_CHECK_ROWS, compile_pipeline, sample_rows
+from ml.inference import InferencePool
+from ml.numpy_cnn import NumpyCNN
+from ml.registry import ModelRegistry, file_version
+from ml.schemas import SCHEMAS
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
+# Oversized uploads are refused with 413 before the body is parsed
+app.config['MAX_CONTENT_LENGTH'] = settings.MAX_UPLOAD_BYTES + 64 * 1024
+
+
+# Heavy dependencies are imported only when a model that needs them is
+# loaded, so the tabular endpoints never pay for TensorFlow or OpenCV
+SKLEARN_MODULES = ('sklearn.pipeline', 'sklearn.linear_model', 'sklearn.ensemble')
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def tabular_loader(name):
+    """Load a pickled pipeline and compile it, falling back to the pipeline itself"""
+    def load(path):
+        pipeline = load_pickle(path)
+        if not settings.COMPILE_MODELS:
+            return pipeline
+        try:
+            # Artifacts were checked on BUILD_CHECK_ROWS rows when built; this is a quick sanity check
+            return compile_pipeline(pipeline, check_rows=sample_rows(SCHEMAS[name], n=LOAD_CHECK_ROWS))
+        except (NotImplementedError, ValueError) as e:
+            print(f"⚠️  Serving {name} uncompiled: {e}", file=sys.stderr)
+            return pipeline
+
+    return load
+
+
+def load_keras(path):
+    tf = startup.import_module('tensorflow')
+    return tf.keras.models.load_model(path, compile=False)
+
+
+def artifact_loader(name, source=None):
+    """
+    Map a model's artifact, refusing one built for other features than the
+    server's schema. When the pickle it was built from (`source`) has changed
+    since, the pickle is served instead until the artifact is rebuilt.
+    """
+    def load(path):
+        model = artifacts.load(path)
+        if name in SCHEMAS:
+            features = [feature['name'] for feature in model.manifest['schema'] or []]
+            if features != list(SCHEMAS[name].names):
+                raise ValueError(f'{os.path.basename(path)} was built for features {features}')
+        source_path = os.path.join(os.path.dirname(path), source) if source else None
+        if source_path and os.path.exists(source_path) and \
+                file_version(source_path) != model.manifest['training'].get('source_version'):
+            print(f"⚠️  {source} changed after the {name} artifact was built; serving it until "
+                  f"`python -m ml.artifacts` rebuilds the artifact", file=sys.stderr)
+            for module in SKLEARN_MODULES:
+                startup.import_module(module)
+            pipeline = tabular_loader(name)(source_path)
+            pipeline.source_path = source_path
+            return pipeline
+        return model
+
+    return load
+
+
+def has_artifact(name):
+    return settings.USE_ARTIFACTS and os.path.exists(os.path.join(models.model_dir, artifacts.manifest_file(name)))
+
+
+def register_tabular(name, pkl_file):
+    """Serve a tabular model from its memory-mapped artifact or from the pickled pipeline"""
+    if settings.COMPILE_MODELS and has_artifact(name):
+        # Retraining rewrites the pickle; the registry watches it as well as the manifest
+        models.register(name, artifacts.manifest_file(name), artifact_loader(name, pkl_file), sources=(pkl_file,))
+    else:
+        models.register(name, pkl_file, tabular_loader(name), requires=SKLEARN_MODULES)
+
+
+def register_cnn(name, h5_file):
+    """Serve a CNN from its artifact or exported .npz (no TensorFlow), or from the .h5 file"""
+    npz_file = os.path.splitext(h5_file)[0] + '.npz'
+    if settings.CNN_RUNTIME != 'keras' and has_artifact(name):
+        models.register(name, artifacts.manifest_file(name), artifact_loader(name))
+    elif settings.CNN_RUNTIME == 'numpy' or (
+            settings.CNN_RUNTIME == 'auto' and os.path.exists(os.path.join(models.model_dir, npz_file))):
+        models.register(name, npz_file, NumpyCNN.load)
+    else:
+        models.register(name, h5_file, load_keras, requires=('tensorflow',), fork_safe=False)
+
+
+# Every model is loaded once per process and hot-reloaded when its file changes
+models = ModelRegistry()
+register_tabular('diabetes', 'diabetes.pkl')
+register_tabular('thyroid', 'thyroid_model.pkl')
+register_tabular('breast_cancer', 'Breast_Cancer_Model.pkl')
+register_cnn('pneumonia', 'pneumonia_model.h5')
+register_cnn('covid', 'Covid2.h5')
+models.on_reload(lambda name, loaded: startup.record_model_load(name, loaded.load_seconds))
+
+# Resubmitted parameters and re-uploaded X-rays are answered from here
+cache = PredictionCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+models.on_reload(lambda name, loaded: cache.invalidate(name))
+
+CNN_INPUT_SIZES = imaging.CNN_INPUT_SIZES
+
+
+# Model code runs here, off the request threads, at most INFERENCE_THREADS at a time
+inference = InferencePool(settings.INFERENCE_THREADS, settings.INFERENCE_MAX_PENDING)
+
+
+def batcher_for(name):
+    def predict(batch):
+        with startup.first_inference(name):
+            return models.get(name).predict(batch, verbose=0)
+
+    return MicroBatcher(
+        name,
+        predict,
+        max_batch_size=settings.BATCH_MAX_SIZE,
+        window_ms=settings.BATCH_WINDOW_MS,
+        max_queue=settings.BATCH_MAX_QUEUE,
+        executor=inference,
+    )
+
+
+# Concurrent X-ray uploads share one forward pass per batch
+batchers = {
+    'pneumonia': batcher_for('pneumonia'),
+    'covid': batcher_for('covid'),
+}
+
+
+@app.before_request
+def before_request():
+    metrics.begin(request.endpoint or 'unknown')
 
 
 @app.after_request
 def after_request(response):
+    timings, total = metrics.finish(response.status_code)
+    if timings is not None:
+        response.headers['Server-Timing'] = timings.server_timing(total)
+        response.headers.add('Access-Control-Expose-Headers', 'Server-Timing')
+    # Exactly which artifact answered, e.g. "diabetes@3f2a9c0d41b7"
+    if 'model_version' in g:
+        response.headers['X-Model-Version'] = g.model_version
+        response.headers.add('Access-Control-Expose-Headers', 'X-Model-Version')
     response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5173')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
@@ -23,35 +172,139 @@ def after_request(response):
 @app.route('/diagnose_Breast_Cancer', methods=['OPTIONS'])
 @app.route('/diagnose_Pneumonia', methods=['OPTIONS'])
 @app.route('/diagnose_Covid', methods=['OPTIONS'])
-def options():
+@app.route('/screen_xray', methods=['OPTIONS'])
+@app.route('/diagnose_bulk/<model_name>', methods=['OPTIONS'])
+def options(model_name=None):
     response = jsonify({'message': 'CORS preflight request successful'})
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
     response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
     return response
 
 
+@app.route('/startup', methods=['GET'])
+def startup_report():
+    return jsonify({'status': 'success', 'startup': startup.report()})
+
+
+@app.route('/models', methods=['GET'])
+def model_info():
+    return jsonify({
+        'status': 'success',
+        'models': models.info(),
+        'batching': {name: batcher.stats() for name, batcher in batchers.items()},
+        'inference': inference.stats(),
+        'cache': cache.stats(),
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_report():
+    """
+    Per-route request and stage latency histograms, in Prometheus text format.
+    Under gunicorn.conf.py a scrape reaches one worker, so its series carry a
+    `pid` label and are summed over workers by the query (sum without (pid)).
+    """
+    labels = {'pid': os.getpid()} if os.environ.get('ML_MASTER_PID') else None
+    return Response(metrics.REGISTRY.exposition(labels), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/memory', methods=['GET'])
+def memory_info():
+    """Resident vs shared memory of this process, or of every worker under gunicorn.conf.py"""
+    master = os.environ.get('ML_MASTER_PID')
+    if master:
+        return jsonify({'status': 'success', 'worker': os.getpid(), **memory.report(int(master))})
+    return jsonify({'status': 'success', 'process': memory.process_memory()})
+
+
+def predict_tabular(name, data):
+    """Positive-class probability for one JSON object, from the cache when possible"""
+    with metrics.stage('load'):
+        loaded = models.get_loaded(name)
+    g.model_version = f'{name}@{loaded.version}'
+    # Validate and pack features in schema order
+    with metrics.stage('validate'):
+        row = SCHEMAS[name].pack(data)
+    with metrics.stage('cache'):
+        key = cache.row_key(name, loaded.version, row)
+        probability = cache.get(key)
+    if probability is None:
+        with metrics.stage('predict'), startup.first_inference(name):
+            probability = float(inference.run(loaded.model.predict_proba, row)[0][1])
+        cache.put(key, probability)
+    return probability
+
+
+def predict_image(name, upload):
+    """Output row of a CNN for one uploaded X-ray, from the cache when possible"""
+    with metrics.stage('load'):
+        loaded = models.get_loaded(name)
+    g.model_version = f'{name}@{loaded.version}'
+    with metrics.stage('read'):
+        data = imaging.read_upload(upload, settings.MAX_UPLOAD_BYTES)
+    with metrics.stage('cache'):
+        key = cache.content_key(name, loaded.version, data)
+        prediction = cache.get(key)
+    if prediction is None:
+        width, height = CNN_INPUT_SIZES[name]
+        with metrics.stage('decode'):
+            image = imaging.decode(data, width, height)
+        with metrics.stage('resize'):
+            image = imaging.resize(image, width, height)
+        # Includes the wait for the rest of the micro-batch
+        with metrics.stage('predict'):
+            prediction = batchers[name].predict(image)
+        cache.put(key, prediction)
+    return prediction
+
+
+def screen_image(upload):
+    """
+    Output row of every CNN for one uploaded X-ray. The upload is read and
+    decoded once, and the models run concurrently on the inference pool.
+    """
+    with metrics.stage('load'):
+        loaded = {name: models.get_loaded(name) for name in CNN_INPUT_SIZES}
+    g.model_version = ', '.join(f'{name}@{model.version}' for name, model in loaded.items())
+    with metrics.stage('read'):
+        data = imaging.read_upload(upload, settings.MAX_UPLOAD_BYTES)
+    predictions = {}
+    keys = {}
+    with metrics.stage('cache'):
+        for name, model in loaded.items():
+            # Kept apart from the single-model routes, whose decode scale can differ
+            keys[name] = cache.content_key(name, f'{model.version}/screen', data)
+            prediction = cache.get(keys[name])
+            if prediction is not None:
+                predictions[name] = prediction
+    missing = [name for name in loaded if name not in predictions]
+    if missing:
+        # One decode at the scale the largest input needs, then one resize per model
+        with metrics.stage('decode'):
+            images = imaging.decode_resized(data, [CNN_INPUT_SIZES[name] for name in missing])
+        with metrics.stage('predict'):
+            futures = {name: batchers[name].submit(image) for name, image in zip(missing, images)}
+            for name, future in futures.items():
+                predictions[name] = future.result()
+                cache.put(keys[name], predictions[name])
+    return predictions
+
+
+def respond(payload):
+    with metrics.stage('serialize'):
+        return jsonify({**payload, 'model_version': g.model_version})
+
+
 #Diabetes controller
 
 @app.route('/diagnose_Diabetes', methods=['POST'])
 def diagnose_Diabetes():
     try:
-        diabetes_model = pickle.load(open('./Ml Models/diabetes.pkl', 'rb'))
-        data = request.get_json()
-        # Extract features in correct order
-        int_features = [
-            float(data['Pregnancies']),
-            float(data['Glucose']),
-            float(data['BloodPressure']),
-            float(data['SkinThickness']),
-            float(data['Insulin']),
-            float(data['BMI']),
-            float(data['DiabetesPedigreeFunction']),
-            float(data['Age'])
-        ]
-        final = [np.array(int_features)]
-        prediction = diabetes_model.predict_proba(final)
-        output = '{0:.{1}f}'.format(prediction[0][1], 2)
-        return jsonify({'status':'success','probability': output})
+        with metrics.stage('parse'):
+            data = request.get_json()
+        probability = predict_tabular('diabetes', data)
+        output = '{0:.{1}f}'.format(probability, 2)
+        return respond({'status':'success','probability': output})
     except Exception as e:
         return jsonify({'status':'failed','error': str(e)})
 
@@ -62,26 +315,11 @@ def diagnose_Diabetes():
 @app.route('/diagnose_Thyroid', methods=['POST'])
 def diagnose_Thyroid():
     try:
-        thyroid_model=pickle.load(open('./Ml Models/thyroid_model.pkl', 'rb'))
-        data = request.get_json()
-        # Extract features in correct order
-        int_features = [
-            float(data['age']),
-            float(data['on_thyroxine']),
-            float(data['query_on_thyroxine']),
-            float(data['on_antithyroid_medication']),
-            float(data['pregnant']),
-            float(data['thyroid_surgery']),
-            float(data['tumor']),
-            float(data['T3']),
-            float(data['TT4']),
-            float(data['T4U']),
-            float(data['FTI'])
-        ]
-        final = [np.array(int_features)]
-        prediction = thyroid_model.predict_proba(final)
-        output = '{0:.{1}f}'.format(prediction[0][1], 2)
-        return jsonify({'status':'success','probability': output})
+        with metrics.stage('parse'):
+            data = request.get_json()
+        probability = predict_tabular('thyroid', data)
+        output = '{0:.{1}f}'.format(probability, 2)
+        return respond({'status':'success','probability': output})
     except Exception as e:
         return jsonify({'error': str(e)})
 
@@ -89,50 +327,46 @@ def diagnose_Thyroid():
 @app.route('/diagnose_Breast_Cancer', methods=['POST'])
 def diagnose_Breast_Cancer():
     try:
-        Breast_Cancer_model = pickle.load(open('./Ml Models/Breast_Cancer_Model.pkl', 'rb'))
-        data = request.get_json()
-        # Extract features in correct order
-        int_features = [
-            float(data['radius_mean']),
-            float(data['texture_mean']),
-            float(data['perimeter_mean']),
-            float(data['area_mean']),
-            float(data['smoothness_mean']),
-            float(data['compactness_mean']),
-            float(data['concavity_mean']),
-            float(data['concave_points_mean']),
-            float(data['radius_worst']),
-            float(data['texture_worst']),
-            float(data['perimeter_worst']),
-            float(data['area_worst']),
-            float(data['smoothness_worst']),
-            float(data['compactness_worst']),
-            float(data['concavity_worst']),
-            float(data['concave_points_worst'])
-        ]
-        final = [np.array(int_features)]
-        prediction = Breast_Cancer_model.predict_proba(final)
-        output = '{0:.{1}f}'.format(prediction[0][1], 2)
-        return jsonify({'status': 'success', 'probability': float(output)})
+        with metrics.stage('parse'):
+            data = request.get_json()
+        probability = predict_tabular('breast_cancer', data)
+        output = '{0:.{1}f}'.format(probability, 2)
+        return respond({'status': 'success', 'probability': float(output)})
     except Exception as e:
         return jsonify({'error': str(e)})       
 
+#Bulk controller for the tabular models
+@app.route('/diagnose_bulk/<model_name>', methods=['POST'])
+def diagnose_bulk(model_name):
+    try:
+        if model_name not in SCHEMAS:
+            return jsonify({'status': 'failed', 'error': f'Unknown model: {model_name}'}), 404
+        with metrics.stage('load'):
+            loaded = models.get_loaded(model_name)
+        g.model_version = f'{model_name}@{loaded.version}'
+        # Reading the body, parsing and validating happen in one pass
+        with metrics.stage('parse'):
+            X, indices, errors = SCHEMAS[model_name].pack_rows(bulk.iter_records(request))
+        with metrics.stage('predict'), startup.first_inference(model_name):
+            probabilities = inference.run(bulk.score, loaded.model, X)
+        total = len(indices) + len(errors)
+    except Exception as e:
+        return jsonify({'status': 'failed', 'error': str(e)})
+    lines = bulk.iter_results(total, indices, probabilities, errors)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+
 #Pneumonia Controller
 @app.route('/diagnose_Pneumonia', methods=['POST'])
 def diagnose_Pneumonia():
     try:
-        if 'image' not in request.files:
+        with metrics.stage('parse'):
+            upload = request.files.get('image')
+        if upload is None:
             return jsonify({'error': 'No file part'})
-        
-        pneumonia_model = tf.keras.models.load_model('./Ml Models/pneumonia_model.h5', compile=False)
-        image = request.files['image'].read()
-        nparr = np.frombuffer(image, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        image = cv2.resize(image, (150, 150))
-        image = np.expand_dims(image, axis=0)
-        prediction = pneumonia_model.predict(image)
-        output = '{0:.{1}f}'.format(prediction[0][1], 2)
-        return jsonify({'status':'success','probability': output})
+        prediction = predict_image('pneumonia', upload)
+        output = '{0:.{1}f}'.format(prediction[1], 2)
+        return respond({'status':'success','probability': output})
     except Exception as e:
         return jsonify({'error': str(e)})
     
@@ -141,21 +375,70 @@ def diagnose_Pneumonia():
 @app.route('/diagnose_Covid', methods=['POST'])
 def diagnose_Covid():
     try:
-        if 'image' not in request.files:
+        with metrics.stage('parse'):
+            upload = request.files.get('image')
+        if upload is None:
             return jsonify({'error': 'No file part'})
-        Covid_model=tf.keras.models.load_model('./Ml Models/Covid2.h5')    
-        image = request.files['image'].read()
-  
-        nparr = np.frombuffer(image, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        image = cv2.resize(image, (64, 64))
-        image = np.expand_dims(image, axis=0)
-        prediction = Covid_model.predict(image)
-        output = '{0:.{1}f}'.format(prediction[0][0], 2)
-        return jsonify({'status':'success','probability': output})
+        prediction = predict_image('covid', upload)
+        output = '{0:.{1}f}'.format(prediction[0], 2)
+        return respond({'status':'success','probability': output})
     except Exception as e:
         return jsonify({'error': str(e)})     
     
 
+#Combined X-ray screening controller
+@app.route('/screen_xray', methods=['POST'])
+def screen_xray():
+    try:
+        with metrics.stage('parse'):
+            upload = request.files.get('image')
+        if upload is None:
+            return jsonify({'error': 'No file part'})
+        predictions = screen_image(upload)
+        probabilities = {
+            'pneumonia': '{0:.{1}f}'.format(predictions['pneumonia'][1], 2),
+            'covid': '{0:.{1}f}'.format(predictions['covid'][0], 2),
+        }
+        return respond({'status': 'success', 'probabilities': probabilities})
+    except Exception as e:
+        return jsonify({'error': str(e)})
+
+
+def fork_unsafe_models():
+    """
+    Models left unloaded in the gunicorn master: TensorFlow's thread pools
+    don't survive fork(), so gunicorn.conf.py loads these in each worker
+    """
+    return models.fork_unsafe() if settings.PREFORK else []
+
+
+def warm_up():
+    """Import dependencies, load every model and run one inference on each"""
+    imaging.cv2()
+    deferred = fork_unsafe_models()
+    models.load_all(exclude=deferred)
+    for name, schema in SCHEMAS.items():
+        try:
+            with startup.first_inference(name):
+                models.get(name).predict_proba(schema.lows.reshape(1, -1))
+        except Exception as e:
+            print(f"⚠️  Warm-up of {name} failed: {e}", file=sys.stderr)
+    for name, (width, height) in CNN_INPUT_SIZES.items():
+        if name in deferred:
+            continue
+        try:
+            batchers[name].predict(np.zeros((height, width, 3), dtype=np.uint8))
+        except Exception as e:
+            print(f"⚠️  Warm-up of {name} failed: {e}", file=sys.stderr)
+
+
+if settings.WARMUP or '--warmup' in sys.argv:
+    warm_up()
+elif settings.PRELOAD_MODELS:
+    models.load_all(exclude=fork_unsafe_models())
+startup.print_report(time.perf_counter() - startup.PROCESS_START)
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # The reloader would start a second process and load every model twice
+    app.run(debug=True, use_reloader=False)
\ No newline at end of file
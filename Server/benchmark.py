@@ -0,0 +1,414 @@
+"""
+Load-test every diagnosis route and the urgency analyzer.
+
+Starts the ML server (serve.py by default, or any --server command), waits
+for it to answer and records the cold start. It then drives each
+/diagnose_* route at each concurrency level for a fixed time with
+synthetic inputs: the training data generators from ml/synthetic.py for
+the tabular and bulk routes, synthetic X-ray JPEGs for the image routes.
+The prediction cache is turned off so every request runs the model. The
+urgency analyzer is benchmarked the same way through its `--serve`
+NDJSON worker (the process the Node server talks to), with the canned
+transcripts from AI_Urgency/benchmarkBackends.py.
+
+The report is JSON (p50/p95/p99 latency, requests/sec, errors, peak RSS of
+the server's process tree, cold start) and can be compared with the report
+of another commit:
+
+    python benchmark.py --json before.json
+    git checkout my-branch
+    python benchmark.py --json after.json --compare before.json
+
+Usage (from Server/):
+    python benchmark.py [--levels 1,4,16] [--seconds 10] [--routes diabetes,pneumonia]
+                        [--server "gunicorn -c gunicorn.conf.py app:app"] [--url http://host:port]
+                        [--no-urgency] [--json report.json] [--compare baseline.json]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+import numpy as np
+
+from ml import memory, synthetic
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+URGENCY_DIR = os.path.join(HERE, 'AI_Urgency')
+
+# route name -> (path, kind, model)
+ROUTES = {
+    'diabetes': ('/diagnose_Diabetes', 'json', 'diabetes'),
+    'thyroid': ('/diagnose_Thyroid', 'json', 'thyroid'),
+    'breast_cancer': ('/diagnose_Breast_Cancer', 'json', 'breast_cancer'),
+    'bulk_diabetes': ('/diagnose_bulk/diabetes', 'bulk', 'diabetes'),
+    'bulk_thyroid': ('/diagnose_bulk/thyroid', 'bulk', 'thyroid'),
+    'bulk_breast_cancer': ('/diagnose_bulk/breast_cancer', 'bulk', 'breast_cancer'),
+    'pneumonia': ('/diagnose_Pneumonia', 'image', None),
+    'covid': ('/diagnose_Covid', 'image', None),
+    'screen_xray': ('/screen_xray', 'image', None),
+}
+
+BULK_ROWS = 100
+XRAY_VARIANTS = 8
+
+# Metrics compared by --compare, and whether a higher value is better
+COMPARED = {'rps': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False}
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2)}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class RssSampler:
+    """Peak RSS and PSS of a process and all of its descendants, sampled in the background"""
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_pss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _tree(self):
+        pids = [self.pid]
+        for pid in pids:
+            pids.extend(memory.child_pids(pid))
+        return pids
+
+    def sample(self):
+        usage = [m for m in map(memory.process_memory, self._tree()) if m]
+        self.peak_rss_mb = max(self.peak_rss_mb, sum(m.get('rss_mb', 0) for m in usage))
+        self.peak_pss_mb = max(self.peak_pss_mb, sum(m.get('pss_mb', 0) for m in usage))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def report(self):
+        return {'peak_rss_mb': round(self.peak_rss_mb, 1), 'peak_pss_mb': round(self.peak_pss_mb, 1)}
+
+
+class Payloads:
+    """Request bodies for each route, distinct per request index"""
+
+    def __init__(self, size=1024):
+        self.records = {name: synthetic.records(name, n_samples=2000, seed=1) for name in synthetic.GENERATORS}
+        self.xrays = synthetic.xray_jpegs(XRAY_VARIANTS, size=size)
+
+    def body(self, route, i):
+        path, kind, model = ROUTES[route]
+        if kind == 'json':
+            rows = self.records[model]
+            return path, json.dumps(rows[i % len(rows)]).encode(), 'application/json'
+        if kind == 'bulk':
+            rows = self.records[model]
+            start = i * BULK_ROWS % len(rows)
+            return path, json.dumps(rows[start:start + BULK_ROWS]).encode(), 'application/json'
+        image = self.xrays[i % len(self.xrays)]
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="xray.jpg"\r\n'
+                f'Content-Type: image/jpeg\r\n\r\n').encode() + image + f'\r\n--{boundary}--\r\n'.encode()
+        return path, body, f'multipart/form-data; boundary={boundary}'
+
+
+def _succeeded(kind, data):
+    if kind == 'bulk':
+        lines = [json.loads(line) for line in data.splitlines() if line.strip()]
+        return bool(lines) and all('error' not in line for line in lines)
+    return json.loads(data).get('status') == 'success'
+
+
+def request(host, port, payloads, route, i, connection=None):
+    """Send request `i` to `route`; returns (seconds, ok, connection to reuse)"""
+    path, body, content_type = payloads.body(route, i)
+    connection = connection or http.client.HTTPConnection(host, port, timeout=60)
+    start = time.perf_counter()
+    try:
+        connection.request('POST', path, body, {'Content-Type': content_type})
+        response = connection.getresponse()
+        ok = response.status == 200 and _succeeded(ROUTES[route][1], response.read())
+    except (OSError, http.client.HTTPException, ValueError):
+        # Dropped keep-alive connection (e.g. a recycled worker): reconnect next time
+        connection.close()
+        return time.perf_counter() - start, False, None
+    return time.perf_counter() - start, ok, connection
+
+
+def closed_loop(concurrency, seconds, send):
+    """
+    `concurrency` clients each sending their next request as soon as the
+    last one is answered. `send(i, state)` returns (seconds, ok, state).
+    """
+    latencies = []
+    errors = [0]
+    counter = iter(range(1 << 62))
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        state = None
+        while time.perf_counter() < deadline:
+            with lock:
+                i = next(counter)
+            elapsed, ok, state = send(i, state)
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += not ok
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / elapsed, 2),
+        **_percentiles(latencies),
+    }
+
+
+def start_server(command, port, env):
+    """Start the server and wait until it answers; returns (process, cold start seconds)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(shlex.split(command), cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f'{command!r} exited with code {process.returncode} before answering')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/models')
+            if connection.getresponse().status == 200:
+                return process, time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.05)
+
+
+def benchmark_routes(host, port, routes, levels, seconds, payloads):
+    results = []
+    for route in routes:
+        # The first request pays for lazy imports and the first inference
+        first_seconds, first_ok, _ = request(host, port, payloads, route, 0)
+        print(f"⏳ {route}: first request {first_seconds * 1000:.1f} ms", file=sys.stderr)
+        for concurrency in levels:
+            result = closed_loop(concurrency, seconds,
+                                 lambda i, connection: request(host, port, payloads, route, i, connection))
+            result.update(route=route, path=ROUTES[route][0], first_request_ms=round(first_seconds * 1000, 2),
+                          first_request_ok=first_ok)
+            if ROUTES[route][1] == 'bulk':
+                result['rows_per_request'] = BULK_ROWS
+            results.append(result)
+            print(f"   c={concurrency:<3} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']} ms  "
+                  f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}", file=sys.stderr)
+    return results
+
+
+class UrgencyClient:
+    """Talks to `aiAnalysis.py --serve` over stdin/stdout, many requests in flight"""
+
+    def __init__(self, env):
+        start = time.perf_counter()
+        # aiAnalysis.py imports ml.metrics from this directory
+        env = dict(env, PYTHONPATH=os.pathsep.join(filter(None, [HERE, env.get('PYTHONPATH')])))
+        self.process = subprocess.Popen([sys.executable, 'aiAnalysis.py', '--serve'], cwd=URGENCY_DIR, env=env,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        text=True, bufsize=1)
+        ready = json.loads(self.process.stdout.readline() or 'null')
+        if not ready or ready.get('event') != 'ready':
+            raise RuntimeError('urgency worker exited before it was ready')
+        self.cold_start_seconds = time.perf_counter() - start
+        self.health = ready['result']
+        self.waiting = {}
+        self.write_lock = threading.Lock()
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            message = json.loads(line)
+            slot = self.waiting.pop(message.get('id'), None)
+            if slot is not None:
+                slot[1] = message
+                slot[0].set()
+
+    def analyze(self, transcript):
+        request_id = uuid.uuid4().hex
+        slot = self.waiting[request_id] = [threading.Event(), None]
+        start = time.perf_counter()
+        with self.write_lock:
+            self.process.stdin.write(json.dumps({'id': request_id, 'op': 'analyze', 'transcript': transcript}) + '\n')
+            self.process.stdin.flush()
+        slot[0].wait(60)
+        ok = slot[1] is not None and 'result' in slot[1]
+        return time.perf_counter() - start, ok
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(30)
+
+
+def benchmark_urgency(levels, seconds, env):
+    sys.path.insert(0, URGENCY_DIR)
+    from benchmarkBackends import TRANSCRIPTS
+
+    client = UrgencyClient(env)
+    try:
+        with RssSampler(client.process.pid) as rss:
+            first_seconds, _ = client.analyze(TRANSCRIPTS[0])
+            results = []
+            for concurrency in levels:
+                result = closed_loop(concurrency, seconds,
+                                     lambda i, state: (*client.analyze(TRANSCRIPTS[i % len(TRANSCRIPTS)]), state))
+                results.append(result)
+                print(f"⏳ urgency c={concurrency:<3} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']} ms  "
+                      f"p95 {result['p95_ms']} ms  errors {result['errors']}", file=sys.stderr)
+    finally:
+        client.close()
+    return {
+        'backend': client.health.get('backend'),
+        'model': client.health.get('model'),
+        'model_loaded': client.health.get('modelLoaded'),
+        'cold_start_seconds': round(client.cold_start_seconds, 3),
+        'first_request_ms': round(first_seconds * 1000, 2),
+        **rss.report(),
+        'levels': results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Percent change of each metric against the same route and concurrency in `baseline`"""
+    def index(data):
+        rows = {(row['route'], row['concurrency']): row for row in data.get('routes', [])}
+        for row in (data.get('urgency') or {}).get('levels', []):
+            rows[('urgency', row['concurrency'])] = row
+        return rows
+
+    before = index(baseline)
+    print(f"\n📊 Compared with {baseline.get('commit')} ('!' = more than 5% worse)")
+    print(f"   {'route':<20}{'c':>4}" + ''.join(f'{metric:>12}' for metric in COMPARED))
+    for key, row in index(report).items():
+        if key not in before:
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before[key].get(metric), row.get(metric)
+            if not old or new is None:
+                cells.append(f"{'-':>12}")
+                continue
+            change = (new - old) / old
+            worse = change < -0.05 if higher_is_better else change > 0.05
+            cells.append(f"{change:>+10.1%}{' !' if worse else '  '}")
+        print(f"   {key[0]:<20}{key[1]:>4}" + ''.join(cells))
+    for metric in ('cold_start_seconds', 'peak_rss_mb'):
+        old, new = baseline.get('server', {}).get(metric), report.get('server', {}).get(metric)
+        if old and new is not None:
+            print(f"   server {metric}: {old} -> {new} ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency and throughput of every diagnosis route and the urgency analyzer')
+    parser.add_argument('--levels', default='1,4,16', help='comma-separated concurrency levels')
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each level')
+    parser.add_argument('--routes', default=','.join(ROUTES), help=f"comma-separated subset of {', '.join(ROUTES)}")
+    parser.add_argument('--server', default=f'{sys.executable} serve.py', help='command that starts the ML server')
+    parser.add_argument('--url', help='benchmark an already running server instead (no cold start or RSS)')
+    parser.add_argument('--xray-size', type=int, default=1024, help='width and height of the synthetic X-rays')
+    parser.add_argument('--no-urgency', action='store_true', help='skip the urgency analyzer')
+    parser.add_argument('--json', help='write the report to this file (default: stdout)')
+    parser.add_argument('--compare', help='print the change against an earlier report')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    routes = [route for route in args.routes.split(',') if route]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    payloads = Payloads(args.xray_size)
+    env = dict(os.environ, CACHE_MAX_ENTRIES='0', PYTHONUNBUFFERED='1')
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {'cpus': os.cpu_count(), 'python': platform.python_version(), 'platform': platform.platform()},
+        'config': {'levels': levels, 'seconds': args.seconds, 'xray_size': args.xray_size,
+                   'bulk_rows': BULK_ROWS, 'server': None if args.url else args.server, 'url': args.url},
+    }
+
+    if routes:
+        if args.url:
+            parsed = urllib.parse.urlparse(args.url)
+            report['server'] = {}
+            report['routes'] = benchmark_routes(parsed.hostname, parsed.port or 80, routes, levels,
+                                                args.seconds, payloads)
+        else:
+            port = _free_port()
+            process, cold_start = start_server(args.server, port, dict(env, HOST='127.0.0.1', PORT=str(port)))
+            print(f"🚀 Server answered after {cold_start:.2f} s", file=sys.stderr)
+            try:
+                with RssSampler(process.pid) as rss:
+                    report['routes'] = benchmark_routes('127.0.0.1', port, routes, levels, args.seconds, payloads)
+            finally:
+                process.terminate()
+                process.wait(30)
+            report['server'] = {'cold_start_seconds': round(cold_start, 3), **rss.report()}
+
+    if not args.no_urgency:
+        report['urgency'] = benchmark_urgency(levels, args.seconds, env)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
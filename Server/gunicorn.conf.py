@@ -0,0 +1,91 @@
+"""
+Pre-fork production server for the Flask ML app.
+
+The master imports app.py, so every model is loaded once before the workers
+are forked; workers then share the read-only weights with the master through
+copy-on-write pages instead of each loading its own copy. Workers are
+recycled after WORKER_MAX_REQUESTS requests (plus jitter, so they don't all
+restart together) and a replacement is forked from the already-loaded master,
+so recycling costs no model load. The exception is a CNN served from its
+.h5 file: TensorFlow can't be used across fork(), so the master doesn't
+import it and each worker loads those models after it is forked. Per-worker
+resident vs shared memory is logged as workers start and exit, and served
+at /memory.
+
+Usage (from Server/):
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import gc
+import os
+import sys
+
+# Split the cores between the workers before ml.settings sizes the inference
+# pool and the BLAS threads each inference call may use
+_cpus = os.cpu_count() or 1
+_workers = int(os.environ.get('WEB_WORKERS') or _cpus)
+os.environ.setdefault('INFERENCE_THREADS', str(max(1, _cpus // _workers)))
+_inference_threads = int(os.environ['INFERENCE_THREADS'])
+os.environ.setdefault('BLAS_THREADS', str(max(1, _cpus // (_workers * _inference_threads))))
+
+from ml import memory, settings  # noqa: E402
+from ml import threads as native_threads  # noqa: E402
+
+# Must happen before app.py imports NumPy, TensorFlow or OpenCV
+native_threads.configure()
+settings.PREFORK = True
+
+bind = f'{settings.HOST}:{settings.PORT}'
+workers = settings.WEB_WORKERS
+worker_class = 'gthread'
+threads = settings.SERVER_THREADS
+# Load app.py (and its models) in the master, before forking
+preload_app = True
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER if settings.WORKER_MAX_REQUESTS else 0
+timeout = settings.WORKER_TIMEOUT
+graceful_timeout = settings.WORKER_GRACEFUL_TIMEOUT
+limit_request_line = 8190
+
+
+def _format(mem):
+    if mem is None:
+        return 'memory n/a'
+    return f"RSS {mem['rss_mb']:.1f} MB, shared {mem['shared_mb']:.1f} MB, private {mem['private_mb']:.1f} MB"
+
+
+def when_ready(server):
+    # Move everything allocated so far out of the collector's reach: a
+    # collection in a worker would otherwise write to (and so copy) every page
+    # holding a tracked object the master created
+    gc.collect()
+    gc.freeze()
+    os.environ['ML_MASTER_PID'] = str(os.getpid())
+    server.log.info(f"🚀 Master {os.getpid()} loaded the models ({_format(memory.process_memory())}); "
+                    f"forking {server.num_workers} workers x {settings.SERVER_THREADS} threads, "
+                    f"{settings.INFERENCE_THREADS} inference threads each")
+
+
+def post_fork(server, worker):
+    app = sys.modules.get('app')
+    if app is None:
+        return
+    deferred = app.models.fork_unsafe()
+    if deferred and (settings.PRELOAD_MODELS or settings.WARMUP):
+        # Left unloaded by the master (app.fork_unsafe_models)
+        app.models.load_all(deferred)
+
+
+def post_worker_init(worker):
+    worker.log.info(f"👷 Worker {worker.pid} ready: {_format(memory.process_memory(worker.pid))}")
+
+
+def worker_exit(server, worker):
+    server.log.info(f"♻️  Worker {worker.pid} exiting after {worker.nr} requests: "
+                    f"{_format(memory.process_memory(worker.pid))}")
+
+
+def nworkers_changed(server, new_value, old_value):
+    if old_value is not None:
+        server.log.info(f"Workers {old_value} -> {new_value}\n"
+                        f"{memory.format_report(memory.report(os.getpid()))}")
@@ -0,0 +1,3 @@
+"""
+Shared serving helpers for the Flask ML server (app.py)
+"""
@@ -0,0 +1,262 @@
+"""
+Memory-mapped model artifacts.
+
+An artifact is two files in the model directory:
+
+    diabetes.manifest.json    format, kind, version, checksum, feature schema,
+                              training metadata and where each array lives
+    diabetes.<version>.bin    every array, uncompressed and 64-byte aligned
+
+Loading reads the small manifest and maps the .bin file read-only; the
+forest node tables, logistic weights and CNN kernels are NumPy views into
+that mapping. Nothing is deserialized or copied, so a load takes
+milliseconds, and every process serving the same artifact (gunicorn
+workers, or separate servers) shares the same page-cache pages.
+
+The manifest is replaced atomically after its .bin file is written, so the
+registry's hot reload (which watches the manifest) never sees half an
+artifact. The version is the start of the SHA-256 of the manifest's
+canonical JSON (kind, attributes, schema, array layout) followed by the .bin
+data, so a change to either gives a new version; the manifest's checksum
+covers the .bin alone. The previous version's .bin is kept until the next
+save, so a process that reads the old manifest just before it is replaced
+can still open its data file.
+
+Run `python3 -m ml.artifacts` from Server/ to export the models in
+MODEL_DIR (pickles, .npz or .h5) as artifacts, `python3 -m ml.artifacts show`
+to list them.
+"""
+
+import glob
+import hashlib
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+
+from ml import settings
+
+
+FORMAT = 1
+ALIGNMENT = 64
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def manifest_file(name):
+    return name + MANIFEST_SUFFIX
+
+
+def _checksum(buffer):
+    return hashlib.sha256(buffer).hexdigest()
+
+
+def _version(description, data):
+    """Start of the SHA-256 over the canonical JSON of `description` and the array bytes"""
+    digest = hashlib.sha256(json.dumps(description, sort_keys=True, separators=(',', ':')).encode())
+    digest.update(data)
+    return digest.hexdigest()[:12]
+
+
+def pack(model):
+    """(kind, arrays, attributes) of a compiled tabular model or a NumpyCNN"""
+    from ml.compiled import CompiledForest, CompiledLogistic
+    from ml.numpy_cnn import NumpyCNN
+
+    if isinstance(model, CompiledLogistic):
+        return 'logistic', {'weights': model.weights}, {'bias': model.bias, 'classes': model.classes_.tolist()}
+    if isinstance(model, CompiledForest):
+        arrays = {'feature': model.feature, 'threshold': model.threshold, 'left': model.left,
+                  'right': model.right, 'value': model.value, 'roots': model.roots}
+        if model.mean is not None:
+            arrays['mean'] = model.mean
+        if model.scale is not None:
+            arrays['scale'] = model.scale
+        return 'forest', arrays, {'depth': int(model.depth), 'classes': model.classes_.tolist()}
+    if isinstance(model, NumpyCNN):
+        return 'cnn', dict(model.weights), {'layers': model.layers, 'input_shape': list(model.input_shape)}
+    raise NotImplementedError(f'{type(model).__name__} can not be stored as an artifact')
+
+
+def _build(kind, arrays, attributes):
+    from ml.compiled import CompiledForest, CompiledLogistic
+    from ml.numpy_cnn import NumpyCNN
+
+    if kind == 'logistic':
+        return CompiledLogistic(arrays['weights'], attributes['bias'], np.array(attributes['classes']))
+    if kind == 'forest':
+        # Stored as int64; only a 32-bit platform needs a copy
+        index = {key: arrays[key] if arrays[key].dtype == np.intp else arrays[key].astype(np.intp)
+                 for key in ('feature', 'left', 'right', 'roots')}
+        return CompiledForest(mean=arrays.get('mean'), scale=arrays.get('scale'), threshold=arrays['threshold'],
+                              value=arrays['value'], depth=attributes['depth'],
+                              classes=np.array(attributes['classes']), **index)
+    if kind == 'cnn':
+        return NumpyCNN(attributes['layers'], arrays, tuple(attributes['input_shape']))
+    raise ValueError(f'Unknown artifact kind {kind!r}')
+
+
+def save(model_dir, name, model, schema=None, training=None):
+    """Write `model` as the current artifact for `name`; returns its manifest"""
+    kind, arrays, attributes = pack(model)
+
+    layout = {}
+    chunks = []
+    offset = 0
+    for key, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype == np.intp:
+            array = array.astype('<i8')
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+        padding = -offset % ALIGNMENT
+        chunks.append(b'\0' * padding)
+        offset += padding
+        layout[key] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        chunks.append(array.tobytes())
+        offset += array.nbytes
+    data = b''.join(chunks)
+    checksum = _checksum(data)
+    schema = None if schema is None else [feature._asdict() for feature in schema.features]
+    version = _version({'kind': kind, 'attributes': attributes, 'schema': schema, 'arrays': layout}, data)
+
+    data_file = f'{name}.{version}.bin'
+    data_path = os.path.join(model_dir, data_file)
+    with open(data_path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(data_path + '.tmp', data_path)
+
+    manifest = {
+        'format': FORMAT,
+        'name': name,
+        'kind': kind,
+        'version': version,
+        'checksum': {'algorithm': 'sha256', 'value': checksum},
+        'data': data_file,
+        'size': len(data),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'schema': schema,
+        'training': training or {},
+        'attributes': attributes,
+        'arrays': layout,
+    }
+    path = os.path.join(model_dir, manifest_file(name))
+    try:
+        keep = {data_file, read_manifest(path)['data']}
+    except (OSError, ValueError, KeyError):
+        keep = {data_file}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+    # The previous .bin stays for a reader that got the old manifest; older
+    # ones go, and processes still serving them keep their mapping
+    for old in glob.glob(os.path.join(glob.escape(model_dir), f'{glob.escape(name)}.*.bin')):
+        if os.path.basename(old) not in keep:
+            os.remove(old)
+    return manifest
+
+
+def read_manifest(path):
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')!r} in {path}")
+    return manifest
+
+
+def load(path, verify=None):
+    """
+    Map the artifact whose manifest is at `path` and build its model. The
+    model gets a `manifest` attribute; `verify` checks the SHA-256 first.
+    """
+    verify = settings.ARTIFACT_VERIFY if verify is None else verify
+    manifest = read_manifest(path)
+    data_path = os.path.join(os.path.dirname(path), manifest['data'])
+    with open(data_path, 'rb') as f:
+        # The mapping stays valid after the file is closed (or replaced)
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if manifest['size'] else b''
+    if len(buffer) != manifest['size']:
+        raise ValueError(f"{manifest['data']} is {len(buffer)} bytes, the manifest says {manifest['size']}")
+    if verify and _checksum(buffer) != manifest['checksum']['value']:
+        raise ValueError(f"Checksum mismatch for {manifest['data']}")
+
+    arrays = {}
+    for key, spec in manifest['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[key] = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec['offset']).reshape(spec['shape'])
+    model = _build(manifest['kind'], arrays, manifest['attributes'])
+    model.manifest = manifest
+    return model
+
+
+# Source files of each model in MODEL_DIR, as registered by app.py
+TABULAR_SOURCES = {'diabetes': 'diabetes.pkl', 'thyroid': 'thyroid_model.pkl', 'breast_cancer': 'Breast_Cancer_Model.pkl'}
+CNN_SOURCES = {'pneumonia': 'pneumonia_model.h5', 'covid': 'Covid2.h5'}
+
+
+def _training_log(model_dir):
+    try:
+        with open(os.path.join(model_dir, 'training.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def export_all(model_dir):
+    """Export every tabular pickle and CNN found in `model_dir`"""
+    import pickle
+    import tempfile
+
+    from ml.compiled import compile_pipeline, sample_rows
+    from ml.numpy_cnn import NumpyCNN, export_h5
+    from ml.registry import file_version
+    from ml.schemas import SCHEMAS
+
+    log = _training_log(model_dir)
+    for name, filename in TABULAR_SOURCES.items():
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            pipeline = pickle.load(f)
+        compiled = compile_pipeline(pipeline, check_rows=sample_rows(SCHEMAS[name]))
+        training = dict(log.get(filename, {}), source=filename, source_version=file_version(path))
+        manifest = save(model_dir, name, compiled, SCHEMAS[name], training)
+        print(f"✅ {name}: {filename} -> {manifest['data']} ({manifest['size'] / 1024:.0f} KB)")
+
+    for name, h5_file in CNN_SOURCES.items():
+        npz_path = os.path.join(model_dir, os.path.splitext(h5_file)[0] + '.npz')
+        h5_path = os.path.join(model_dir, h5_file)
+        if os.path.exists(npz_path):
+            source = npz_path
+            cnn = NumpyCNN.load(npz_path)
+        elif os.path.exists(h5_path):
+            source = h5_path
+            with tempfile.TemporaryDirectory() as tmp:
+                export_h5(h5_path, os.path.join(tmp, 'model.npz'))
+                cnn = NumpyCNN.load(os.path.join(tmp, 'model.npz'))
+        else:
+            continue
+        training = {'source': os.path.basename(source), 'source_version': file_version(source)}
+        manifest = save(model_dir, name, cnn, training=training)
+        print(f"✅ {name}: {os.path.basename(source)} -> {manifest['data']} ({manifest['size'] / 1024:.0f} KB)")
+
+
+def show(model_dir):
+    for path in sorted(glob.glob(os.path.join(glob.escape(model_dir), '*' + MANIFEST_SUFFIX))):
+        manifest = read_manifest(path)
+        training = manifest['training']
+        print(f"{manifest['name']:<15} {manifest['kind']:<9} version {manifest['version']}  "
+              f"{manifest['size'] / 1024:8.0f} KB  created {manifest['created_at']}  "
+              f"from {training.get('source', '?')}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:2] == ['show']:
+        show(settings.MODEL_DIR)
+    else:
+        export_all(settings.MODEL_DIR)
@@ -0,0 +1,112 @@
+"""
+Dynamic micro-batching for the image models.
+
+Concurrent requests are queued and a single worker thread collects them for
+up to `window_ms` or `max_batch_size` items, runs one batched forward pass
+and hands every caller back its own row of the output. With an `executor`
+(ml/inference.py) the forward pass runs on that pool, so the next batch is
+collected while the previous one is still running.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class MicroBatcher:
+    def __init__(self, name, predict_fn, max_batch_size=16, window_ms=5.0, max_queue=256, executor=None):
+        self.name = name
+        self.executor = executor
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._running = None
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so a forked worker starts its own
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                if self.executor is not None:
+                    # At most one batch per pool thread; meanwhile requests queue into the next batch
+                    self._running = threading.Semaphore(self.executor.workers)
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name=f'batcher-{self.name}', daemon=True)
+                self._worker.start()
+
+    def submit(self, x):
+        """Queue one input (without batch axis) and return a Future for its output row"""
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((x, future))
+        except queue.Full:
+            raise QueueFullError(f'{self.name} inference queue is full, try again later')
+        return future
+
+    def predict(self, x, timeout=None):
+        return self.submit(x).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _execute(self, batch):
+        inputs = [x for x, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            outputs = self.predict_fn(np.stack(inputs))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        finally:
+            if self.executor is not None:
+                self._running.release()
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+        for future, output in zip(futures, outputs):
+            future.set_result(output)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if self.executor is None:
+                self._execute(batch)
+            else:
+                self._running.acquire()
+                self.executor.submit(self._execute, batch, block=True)
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+        }
@@ -0,0 +1,65 @@
+"""
+Bulk scoring for the tabular models.
+
+A request body can be a JSON array of feature objects, NDJSON (one object
+per line) or CSV with a header row. Rows are validated by the model's
+FeatureSchema, every valid row is scored with a single `predict_proba` call
+and invalid rows are reported without failing the batch.
+"""
+
+import csv
+import io
+import json
+
+import numpy as np
+
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+def iter_records(req):
+    """Yield `(record, error)` for each row of the request body"""
+    content_type = (req.mimetype or '').lower()
+
+    if content_type in NDJSON_TYPES:
+        text = io.TextIOWrapper(req.stream, encoding='utf-8')
+        for line in text:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f'invalid JSON: {e}'
+
+    elif content_type in CSV_TYPES:
+        text = io.TextIOWrapper(req.stream, encoding='utf-8', newline='')
+        for row in csv.DictReader(text):
+            yield row, None
+
+    else:
+        data = req.get_json(force=True)
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array of feature objects')
+        for row in data:
+            yield row, None
+
+
+def score(model, X):
+    """Positive-class probability for every row, in one call"""
+    if len(X) == 0:
+        return np.empty(0)
+    return model.predict_proba(X)[:, 1]
+
+
+def iter_results(total, indices, probabilities, errors):
+    """Yield one NDJSON line per input row, in input order"""
+    probability_of = dict(zip(indices, probabilities))
+    for i in range(total):
+        if i in errors:
+            line = {'row': i, 'status': 'failed', 'error': errors[i]}
+        else:
+            line = {'row': i, 'status': 'success', 'probability': round(float(probability_of[i]), 2)}
+        yield json.dumps(line) + '\n'
+    yield json.dumps({'summary': {'rows': total, 'scored': len(indices), 'failed': len(errors)}}) + '\n'
@@ -0,0 +1,82 @@
+"""
+Bounded LRU + TTL cache of prediction results.
+
+Keys combine the model name, the loaded model version and a digest of the
+input (the packed feature row for the tabular models, a hash of the upload
+bytes for the CNNs), so a reloaded model never serves stale results.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10000, ttl=600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def row_key(model_name, version, row):
+        """Key for a packed float row; -0.0 and 0.0 map to the same key"""
+        return model_name, version, (row + 0.0).tobytes()
+
+    @staticmethod
+    def content_key(model_name, version, data):
+        """Key for raw upload bytes"""
+        return model_name, version, hashlib.blake2b(memoryview(data), digest_size=16).digest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model_name=None):
+        """Drop every entry, or only those of one model"""
+        with self._lock:
+            if model_name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == model_name]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            }
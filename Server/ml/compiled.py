@@ -0,0 +1,192 @@
+"""
+Compile the scikit-learn tabular pipelines into small array-backed predictors.
+
+- StandardScaler + logistic model: the scaler is folded into the weights,
+  so a prediction is one dot product and a sigmoid.
+- StandardScaler + RandomForestClassifier: every tree is flattened into
+  shared contiguous node arrays and all trees are walked at once with
+  vectorized NumPy indexing.
+
+Both expose `predict_proba` with the same output as the original pipeline.
+`compile_pipeline` checks that on sample rows before returning: BUILD_CHECK_ROWS
+when an artifact is built (train_all_models.py, `python -m ml.artifacts`),
+where a mismatch fails the build, and only LOAD_CHECK_ROWS when app.py
+compiles a pickle on load, so a (re)load stays cheap.
+
+Run `python3 -m ml.compiled` from Server/ to check every model and time it.
+"""
+
+import numpy as np
+
+
+# Largest probability difference accepted by the equivalence check
+TOLERANCE = 1e-9
+# Sample rows checked when building an artifact, and when compiling on load
+BUILD_CHECK_ROWS = 2000
+LOAD_CHECK_ROWS = 16
+
+
+class CompiledLogistic:
+    def __init__(self, weights, bias, classes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        z = np.asarray(X, dtype=np.float64) @ self.weights + self.bias
+        p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+
+class CompiledForest:
+    def __init__(self, mean, scale, feature, threshold, left, right, value, roots, depth, classes):
+        self.mean = mean
+        self.scale = scale
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+
+    def _scaled(self, X):
+        X = np.array(X, dtype=np.float64)
+        # Same operations and float32 cast as StandardScaler + DecisionTreeClassifier
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X.astype(np.float32)
+
+    def predict_proba(self, X):
+        X = self._scaled(X)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+
+def _scaler_params(steps):
+    """mean and scale of an optional leading StandardScaler"""
+    from sklearn.preprocessing import StandardScaler
+
+    if len(steps) == 2 and isinstance(steps[0], StandardScaler):
+        return steps[0].mean_, steps[0].scale_
+    if len(steps) == 1:
+        return None, None
+    raise NotImplementedError('Only [StandardScaler] + classifier pipelines can be compiled')
+
+
+def _is_logistic(clf):
+    from sklearn.linear_model import LogisticRegression
+
+    return isinstance(clf, LogisticRegression) or getattr(clf, 'loss', None) == 'log_loss'
+
+
+def compile_logistic(clf, mean, scale):
+    if len(clf.classes_) != 2:
+        raise NotImplementedError('Only binary logistic models can be compiled')
+    weights = clf.coef_[0].astype(np.float64)
+    bias = float(clf.intercept_[0])
+    if scale is not None:
+        weights = weights / scale
+    if mean is not None:
+        bias -= float(weights @ mean)
+    return CompiledLogistic(weights, bias, clf.classes_)
+
+
+def compile_forest(forest, mean, scale):
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        leaf = tree.children_left == -1
+        ids = np.arange(n)
+        # Leaves point to themselves, so walking max_depth steps always ends on one
+        lefts.append(np.where(leaf, ids, tree.children_left) + offset)
+        rights.append(np.where(leaf, ids, tree.children_right) + offset)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        value = tree.value[:, 0, :].astype(np.float64)
+        values.append(value / value.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += n
+    return CompiledForest(
+        mean=None if mean is None else np.asarray(mean, dtype=np.float64),
+        scale=None if scale is None else np.asarray(scale, dtype=np.float64),
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+        right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+        value=np.ascontiguousarray(np.concatenate(values)),
+        roots=np.array(roots, dtype=np.intp),
+        depth=max(estimator.tree_.max_depth for estimator in forest.estimators_),
+        classes=forest.classes_,
+    )
+
+
+def sample_rows(schema, n=BUILD_CHECK_ROWS, seed=0):
+    """Random rows covering each feature's valid range, used for the equivalence check"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(schema.lows, schema.highs, size=(n, len(schema)))
+    X[:, schema.whole] = np.round(X[:, schema.whole])
+    return X
+
+
+def max_difference(pipeline, compiled, X):
+    return float(np.max(np.abs(pipeline.predict_proba(X) - compiled.predict_proba(X))))
+
+
+def compile_pipeline(pipeline, check_rows=None):
+    """
+    Compile a fitted pipeline (or bare classifier). Raises NotImplementedError
+    for unsupported models and ValueError if the compiled predictor disagrees
+    with the pipeline on `check_rows`.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    steps = [step for _, step in pipeline.steps] if hasattr(pipeline, 'steps') else [pipeline]
+    mean, scale = _scaler_params(steps)
+    clf = steps[-1]
+    if isinstance(clf, RandomForestClassifier):
+        compiled = compile_forest(clf, mean, scale)
+    elif _is_logistic(clf):
+        compiled = compile_logistic(clf, mean, scale)
+    else:
+        raise NotImplementedError(f'{type(clf).__name__} can not be compiled')
+
+    if check_rows is not None:
+        diff = max_difference(pipeline, compiled, check_rows)
+        if diff > TOLERANCE:
+            raise ValueError(f'Compiled model differs from the pipeline by {diff:.2e}')
+    return compiled
+
+
+if __name__ == '__main__':
+    import os
+    import pickle
+    import time
+
+    from ml import settings
+    from ml.schemas import SCHEMAS
+
+    files = {'diabetes': 'diabetes.pkl', 'thyroid': 'thyroid_model.pkl', 'breast_cancer': 'Breast_Cancer_Model.pkl'}
+    for name, filename in files.items():
+        with open(os.path.join(settings.MODEL_DIR, filename), 'rb') as f:
+            pipeline = pickle.load(f)
+        X = sample_rows(SCHEMAS[name], n=10000, seed=1)
+        compiled = compile_pipeline(pipeline, check_rows=X)
+        row = X[:1]
+        timings = []
+        for model in (pipeline, compiled):
+            start = time.perf_counter()
+            for _ in range(200):
+                model.predict_proba(row)
+            timings.append((time.perf_counter() - start) / 200)
+        print(f"✅ {name}: max difference {max_difference(pipeline, compiled, X):.2e} on {len(X)} rows, "
+              f"one row {timings[0] * 1e6:.0f} µs -> {timings[1] * 1e6:.0f} µs")
@@ -0,0 +1,146 @@
+"""
+X-ray upload preprocessing.
+
+Uploads are read without an extra bytes copy into a buffer sized to the
+upload (small ones are reused by the thread), JPEGs much larger than the
+model input are decoded at 1/2, 1/4 or 1/8 scale by libjpeg, and the resize
+writes into a preallocated array.
+"""
+
+import struct
+import threading
+
+import numpy as np
+
+from ml import startup
+
+
+# (width, height) of the image each CNN expects
+CNN_INPUT_SIZES = {
+    'pneumonia': (150, 150),
+    'covid': (64, 64),
+}
+
+# Unknown-length uploads are read into a buffer starting at this size and doubling
+UPLOAD_CHUNK_BYTES = 1 << 20
+# Upload buffers up to this size are reused by the thread's next upload
+KEEP_UPLOAD_BYTES = 4 << 20
+
+_local = threading.local()
+
+
+def cv2():
+    """OpenCV is imported on first use so tabular-only workers never load it"""
+    return startup.import_module('cv2')
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def read_upload(file_storage, max_bytes):
+    """
+    Return the upload as a uint8 array without copying it when possible.
+    The array may be a view into a per-thread buffer reused by the next call.
+    """
+    stream = file_storage.stream
+    if hasattr(stream, 'getbuffer'):
+        # Small uploads are spooled into a BytesIO; view its memory directly
+        data = stream.getbuffer()
+        if len(data) > max_bytes:
+            raise UploadTooLargeError(f'Image exceeds {max_bytes} bytes')
+        return np.frombuffer(data, np.uint8)
+
+    # Sized from the declared length when there is one, else grown as the upload arrives
+    capacity = min(max_bytes + 1, max(UPLOAD_CHUNK_BYTES, (file_storage.content_length or 0) + 1))
+    buffer = getattr(_local, 'upload', None)
+    if buffer is None or len(buffer) < capacity:
+        buffer = bytearray(capacity)
+    size = 0
+    while size <= max_bytes:
+        if size == len(buffer):
+            grown = bytearray(min(max_bytes + 1, 2 * len(buffer)))
+            grown[:size] = buffer
+            buffer = grown
+        n = stream.readinto(memoryview(buffer)[size:])
+        if not n:
+            break
+        size += n
+    # Only small buffers are kept for the thread's next upload
+    _local.upload = buffer if len(buffer) <= KEEP_UPLOAD_BYTES else None
+    if size > max_bytes:
+        raise UploadTooLargeError(f'Image exceeds {max_bytes} bytes')
+    return np.frombuffer(buffer, np.uint8, count=size)
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG header, or None if it isn't a baseline/progressive JPEG"""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        length = (int(data[i + 2]) << 8) | int(data[i + 3])
+        # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', bytes(data[i + 5:i + 9]))
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduced_decode_flag(data, width, height):
+    """Pick the largest libjpeg scale that still covers the target size"""
+    cv = cv2()
+    size = jpeg_size(data)
+    if size is None:
+        return cv.IMREAD_COLOR
+    for factor, flag in ((8, cv.IMREAD_REDUCED_COLOR_8), (4, cv.IMREAD_REDUCED_COLOR_4),
+                         (2, cv.IMREAD_REDUCED_COLOR_2)):
+        if size[0] // factor >= width and size[1] // factor >= height:
+            return flag
+    return cv.IMREAD_COLOR
+
+
+def decode(data, width, height):
+    """Decode an encoded image at the smallest scale that is still >= (width, height)"""
+    # OpenCV asserts on an empty buffer instead of returning None
+    if len(data) == 0:
+        raise ValueError('Could not decode image')
+    image = cv2().imdecode(data, reduced_decode_flag(data, width, height))
+    if image is None:
+        raise ValueError('Could not decode image')
+    return image
+
+
+def resize(image, width, height):
+    """Resize into this thread's preallocated (height, width, 3) buffer"""
+    key = (width, height)
+    buffers = getattr(_local, 'resized', None)
+    if buffers is None:
+        buffers = _local.resized = {}
+    out = buffers.get(key)
+    if out is None:
+        out = buffers[key] = np.empty((height, width, 3), dtype=np.uint8)
+    return cv2().resize(image, (width, height), dst=out)
+
+
+def decode_resized(data, sizes):
+    """
+    Decode once at a scale covering every (width, height) in `sizes` and
+    return a new resized array for each, in the same order
+    """
+    image = decode(data, max(width for width, _ in sizes), max(height for _, height in sizes))
+    return [cv2().resize(image, size) for size in sizes]
+
+
+def preprocess(file_storage, width, height, max_bytes):
+    """Upload -> (height, width, 3) uint8 BGR array, like imdecode + resize"""
+    data = read_upload(file_storage, max_bytes)
+    return resize(decode(data, width, height), width, height)
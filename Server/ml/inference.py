@@ -0,0 +1,74 @@
+"""
+Bounded thread pool that runs model code off the request threads.
+
+Request threads keep reading uploads and parsing JSON while at most
+`workers` predictions run at once; up to `max_pending` more may wait, after
+which new calls fail fast with QueueFullError instead of piling up.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ml.batching import QueueFullError
+
+
+class InferencePool:
+    def __init__(self, workers, max_pending=64):
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._executor = None
+        self._pid = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _ensure_executor(self):
+        # Threads don't survive fork(), so a forked worker starts its own pool
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+                self._pid = os.getpid()
+                self.in_flight = 0
+            return self._executor
+
+    def _done(self, future):
+        with self._slot_free:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slot_free.notify()
+
+    def submit(self, fn, *args, block=False):
+        """
+        Run fn(*args) on the pool and return its Future. When the pool is full
+        raise QueueFullError, or with block=True wait for a free slot.
+        """
+        executor = self._ensure_executor()
+        with self._slot_free:
+            while self.in_flight >= self.workers + self.max_pending:
+                if not block:
+                    self.rejected += 1
+                    raise QueueFullError('Inference queue is full, try again later')
+                self._slot_free.wait()
+            self.in_flight += 1
+        future = executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, timeout=None):
+        """fn(*args) computed on the pool; the calling thread only waits"""
+        return self.submit(fn, *args).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,68 @@
+"""
+Resident vs shared memory of the server processes.
+
+Reads /proc/<pid>/smaps_rollup (Linux), so pre-forked workers can show how
+much of their resident memory (RSS) is still shared with the parent through
+copy-on-write pages (model weights loaded before the fork) and how much is
+private to them. PSS splits every shared page between the processes using
+it, so summing PSS over all workers gives their real combined footprint.
+"""
+
+import os
+
+
+FIELDS = {
+    'Rss': 'rss_mb',
+    'Pss': 'pss_mb',
+    'Shared_Clean': 'shared_clean_mb',
+    'Shared_Dirty': 'shared_dirty_mb',
+    'Private_Clean': 'private_clean_mb',
+    'Private_Dirty': 'private_dirty_mb',
+}
+
+
+def process_memory(pid=None):
+    """Memory of one process in MB, or None where smaps_rollup isn't available"""
+    pid = pid or os.getpid()
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    result = {'pid': pid}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in FIELDS:
+            result[FIELDS[key]] = round(int(value.split()[0]) / 1024, 1)
+    result['shared_mb'] = round(result.get('shared_clean_mb', 0) + result.get('shared_dirty_mb', 0), 1)
+    result['private_mb'] = round(result.get('private_clean_mb', 0) + result.get('private_dirty_mb', 0), 1)
+    return result
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def report(parent):
+    """The parent process (the gunicorn master) and each of its children"""
+    workers = [memory for memory in map(process_memory, child_pids(parent)) if memory]
+    return {
+        'parent': process_memory(parent),
+        'workers': workers,
+        'workers_pss_mb': round(sum(worker.get('pss_mb', 0) for worker in workers), 1),
+        'workers_rss_mb': round(sum(worker.get('rss_mb', 0) for worker in workers), 1),
+    }
+
+
+def format_report(data):
+    lines = [f"   {'pid':>8} {'RSS MB':>9} {'shared':>9} {'private':>9} {'PSS MB':>9}"]
+    rows = ([('master', data['parent'])] if data['parent'] else []) + [('worker', w) for w in data['workers']]
+    for role, memory in rows:
+        lines.append(f"   {memory['pid']:>8} {memory.get('rss_mb', 0):>9.1f} {memory['shared_mb']:>9.1f} "
+                     f"{memory['private_mb']:>9.1f} {memory.get('pss_mb', 0):>9.1f}  {role}")
+    lines.append(f"   workers: RSS {data['workers_rss_mb']:.1f} MB, actual (PSS) {data['workers_pss_mb']:.1f} MB")
+    return '\n'.join(lines)
@@ -0,0 +1,207 @@
+"""
+Per-stage latency metrics.
+
+Code wraps each stage of a request (model load, decode, resize, predict,
+serialization, ...) in `stage(name)`. The time is added to the request's
+Timings, which app.py sends back as a Server-Timing header, and to the
+`ml_stage_seconds{route, stage}` histogram served in Prometheus text format
+at /metrics. Histograms and counters keep their own lock-protected counts
+and have no dependencies, so the urgency analyzer (AI_Urgency/aiAnalysis.py)
+imports them too. Every gunicorn worker keeps its own counts, so
+app.py labels the series with the worker's `pid`; sum over it to aggregate.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Upper bounds (seconds) of the histogram buckets, from 0.25 ms to 10 s
+BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf) and the sum
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def snapshot(self):
+        """{label values: (cumulative bucket counts, sum, count)}"""
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        result = {}
+        for labels, (counts, total) in series.items():
+            cumulative = []
+            running = 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result[labels] = (cumulative, total, running)
+        return result
+
+    def summary(self):
+        """JSON-friendly count, mean and upper bucket bound of the median and p95, per series"""
+        result = {}
+        for labels, (cumulative, total, count) in self.snapshot().items():
+            bounds = self.buckets + (float('inf'),)
+
+            def quantile(q):
+                rank = q * count
+                return next(bound for bound, seen in zip(bounds, cumulative) if seen >= rank)
+
+            result['/'.join(map(str, labels)) or self.name] = {
+                'count': count,
+                'mean_ms': round(total / count * 1000, 3) if count else None,
+                'p50_le_ms': quantile(0.5) * 1000 if count else None,
+                'p95_le_ms': quantile(0.95) * 1000 if count else None,
+            }
+        return result
+
+    def exposition(self, extra=()):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        extra = list(extra)
+        for labels, (cumulative, total, count) in sorted(self.snapshot().items()):
+            for bound, seen in zip(self.buckets + (float('inf'),), cumulative):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, extra + [('le', _number(bound))])} "
+                             f"{seen}")
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels, extra)} {total!r}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels, extra)} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def exposition(self, extra=()):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        lines.extend(f'{self.name}{_labels(self.labelnames, labels, extra)} {value}' for labels, value in values)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def exposition(self, labels=None):
+        """All metrics in the Prometheus text format, with `labels` ({name: value}) added to every series"""
+        extra = list((labels or {}).items())
+        return '\n'.join(line for metric in self.metrics for line in metric.exposition(extra)) + '\n'
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram('ml_request_seconds', 'Time from the start of a request to its response',
+                                     ('route', 'status'))
+STAGE_SECONDS = REGISTRY.histogram('ml_stage_seconds', 'Time spent in each stage of a request', ('route', 'stage'))
+STAGE_ERRORS = REGISTRY.counter('ml_stage_errors_total', 'Requests that failed in each stage', ('route', 'stage'))
+
+
+class Timings:
+    """Stages of one request, in the order they ran"""
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages = []
+
+    def server_timing(self, total):
+        """Server-Timing header value; durations are in milliseconds"""
+        entries = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in self.stages]
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+_current = contextvars.ContextVar('timings', default=None)
+
+
+def begin(route):
+    """Start timing a request on this thread"""
+    timings = Timings(route)
+    _current.set(timings)
+    return timings
+
+
+def finish(status):
+    """Record the request's total time; returns its Timings and total seconds, or (None, None)"""
+    timings = _current.get()
+    if timings is None:
+        return None, None
+    _current.set(None)
+    total = time.perf_counter() - timings.start
+    REQUEST_SECONDS.observe(total, timings.route, str(status))
+    return timings, total
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current request (or of no request, under route 'none')"""
+    timings = _current.get()
+    route = timings.route if timings is not None else 'none'
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(route, name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, route, name)
+        if timings is not None:
+            timings.stages.append((name, elapsed))
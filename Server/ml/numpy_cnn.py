@@ -0,0 +1,243 @@
+"""
+TensorFlow-free runtime for the X-ray CNNs.
+
+`export_h5` reads a Keras .h5 file (layer configs + weights) with h5py and
+writes a flat, uncompressed .npz. `NumpyCNN` runs the forward pass of that
+file with NumPy only, so serving workers don't need TensorFlow installed.
+
+Supported layers: Conv2D, MaxPooling2D, AveragePooling2D,
+GlobalAveragePooling2D, GlobalMaxPooling2D, BatchNormalization, Flatten,
+Dense, Dropout, Activation, Rescaling and InputLayer.
+"""
+
+import json
+
+import numpy as np
+
+
+SUPPORTED_LAYERS = {
+    'InputLayer', 'Conv2D', 'MaxPooling2D', 'AveragePooling2D', 'GlobalAveragePooling2D',
+    'GlobalMaxPooling2D', 'BatchNormalization', 'Flatten', 'Dense', 'Dropout', 'Activation', 'Rescaling',
+}
+
+# Per-layer weight names, in the order they are stored in the .npz
+WEIGHT_NAMES = {
+    'Conv2D': ('kernel', 'bias'),
+    'Dense': ('kernel', 'bias'),
+    'BatchNormalization': ('gamma', 'beta', 'moving_mean', 'moving_variance'),
+}
+
+
+# Largest kh*kw*C_in unrolled into a single patch matrix by conv2d
+IM2COL_MAX_DEPTH = 64
+
+
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    None: lambda x: x,
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'sigmoid': _sigmoid,
+    'softmax': _softmax,
+    'tanh': np.tanh,
+}
+
+
+def _pair(value):
+    return tuple(value) if isinstance(value, (list, tuple)) else (value, value)
+
+
+def _same_padding(size, kernel, stride):
+    out = -(-size // stride)
+    total = max((out - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad(x, kernel, strides, padding, value=0.0):
+    if padding != 'same':
+        return x
+    top, bottom = _same_padding(x.shape[1], kernel[0], strides[0])
+    left, right = _same_padding(x.shape[2], kernel[1], strides[1])
+    if top == bottom == left == right == 0:
+        return x
+    return np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)), constant_values=value)
+
+
+def _windows(x, kernel, strides):
+    """Yield the strided slice of `x` for every kernel offset"""
+    out_h = (x.shape[1] - kernel[0]) // strides[0] + 1
+    out_w = (x.shape[2] - kernel[1]) // strides[1] + 1
+    for i in range(kernel[0]):
+        for j in range(kernel[1]):
+            yield i, j, x[:, i:i + strides[0] * (out_h - 1) + 1:strides[0],
+                          j:j + strides[1] * (out_w - 1) + 1:strides[1], :]
+
+
+def conv2d(x, kernel, bias, strides, padding):
+    """
+    Conv2D as matrix products. Shallow inputs (the RGB layer) are unrolled
+    into one (N*H*W, kh*kw*C_in) patch matrix; deeper ones use one
+    (N*H*W, C_in) @ (C_in, C_out) product per kernel offset to bound memory.
+    """
+    kh, kw, c_in, c_out = kernel.shape
+    x = _pad(x, (kh, kw), strides, padding)
+    windows = [window for _, _, window in _windows(x, (kh, kw), strides)]
+    if kh * kw * c_in <= IM2COL_MAX_DEPTH:
+        out = np.concatenate(windows, axis=-1) @ kernel.reshape(kh * kw * c_in, c_out)
+    else:
+        out = windows[0] @ kernel[0, 0]
+        for (i, j), window in zip(np.ndindex(kh, kw), windows):
+            if (i, j) != (0, 0):
+                out += window @ kernel[i, j]
+    if bias is not None:
+        out += bias
+    return out
+
+
+def pool2d(x, pool_size, strides, padding, reduce):
+    x = _pad(x, pool_size, strides, padding, value=-np.inf if reduce is np.maximum else 0.0)
+    out = None
+    for _, _, window in _windows(x, pool_size, strides):
+        if out is None:
+            out = window.copy()
+        else:
+            reduce(out, window, out=out)
+    if reduce is np.add:
+        out /= pool_size[0] * pool_size[1]
+    return out
+
+
+class NumpyCNN:
+    def __init__(self, layers, weights, input_shape):
+        self.layers = layers
+        self.weights = weights
+        self.input_shape = input_shape
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data['config']))
+            weights = {key: np.ascontiguousarray(data[key], dtype=np.float32)
+                       for key in data.files if key != 'config'}
+        return cls(config['layers'], weights, tuple(config['input_shape']))
+
+    def _weights(self, index, layer):
+        return [self.weights.get(f'{index}/{name}') for name in WEIGHT_NAMES[layer['class_name']]]
+
+    def predict(self, batch, verbose=0):
+        """Same contract as keras Model.predict: (N, H, W, C) -> (N, outputs)"""
+        x = np.asarray(batch, dtype=np.float32)
+        for index, layer in enumerate(self.layers):
+            kind = layer['class_name']
+            config = layer['config']
+
+            if kind == 'Conv2D':
+                kernel, bias = self._weights(index, layer)
+                x = conv2d(x, kernel, bias, _pair(config['strides']), config['padding'])
+                x = ACTIVATIONS[config.get('activation')](x)
+            elif kind in ('MaxPooling2D', 'AveragePooling2D'):
+                pool_size = _pair(config['pool_size'])
+                strides = _pair(config.get('strides') or pool_size)
+                reduce = np.maximum if kind == 'MaxPooling2D' else np.add
+                x = pool2d(x, pool_size, strides, config['padding'], reduce)
+            elif kind == 'GlobalAveragePooling2D':
+                x = x.mean(axis=(1, 2))
+            elif kind == 'GlobalMaxPooling2D':
+                x = x.max(axis=(1, 2))
+            elif kind == 'BatchNormalization':
+                gamma, beta, mean, variance = self._weights(index, layer)
+                scale = 1.0 / np.sqrt(variance + config.get('epsilon', 1e-3))
+                if gamma is not None:
+                    scale = scale * gamma
+                x = (x - mean) * scale
+                if beta is not None:
+                    x += beta
+            elif kind == 'Flatten':
+                x = x.reshape(len(x), -1)
+            elif kind == 'Dense':
+                kernel, bias = self._weights(index, layer)
+                x = x @ kernel
+                if bias is not None:
+                    x += bias
+                x = ACTIVATIONS[config.get('activation')](x)
+            elif kind == 'Activation':
+                x = ACTIVATIONS[config['activation']](x)
+            elif kind == 'Rescaling':
+                x = x * np.float32(config['scale']) + np.float32(config.get('offset', 0.0))
+            # InputLayer and Dropout are identities at inference time
+        return x
+
+
+def _layer_config(config):
+    """Keep only what the forward pass needs"""
+    keys = ('strides', 'padding', 'activation', 'pool_size', 'epsilon', 'scale', 'offset')
+    return {key: config[key] for key in keys if key in config}
+
+
+def export_h5(h5_path, out_path):
+    """Convert a Sequential Keras .h5 file to the .npz read by NumpyCNN.load"""
+    import h5py
+
+    with h5py.File(h5_path, 'r') as f:
+        model_config = json.loads(f.attrs['model_config'])
+        if model_config['class_name'] != 'Sequential':
+            raise NotImplementedError(f"Only Sequential models are supported, got {model_config['class_name']}")
+        layer_configs = model_config['config']['layers']
+        weights_group = f['model_weights'] if 'model_weights' in f else f
+
+        layers = []
+        arrays = {}
+        input_shape = None
+        for layer in layer_configs:
+            kind = layer['class_name']
+            config = layer['config']
+            if kind not in SUPPORTED_LAYERS:
+                raise NotImplementedError(f'Layer {kind} is not supported by the NumPy runtime')
+            shape = config.get('batch_shape') or config.get('batch_input_shape')
+            if input_shape is None and shape:
+                input_shape = list(shape[1:])
+            if kind == 'InputLayer':
+                continue
+            if config.get('data_format', 'channels_last') != 'channels_last':
+                raise NotImplementedError('Only channels_last models are supported')
+            if kind == 'Conv2D' and (tuple(_pair(config.get('dilation_rate', 1))) != (1, 1) or config.get('groups', 1) != 1):
+                raise NotImplementedError('Dilated and grouped convolutions are not supported')
+
+            index = len(layers)
+            layers.append({'class_name': kind, 'config': _layer_config(config)})
+            if kind in WEIGHT_NAMES:
+                group = weights_group[config['name']]
+                stored = {}
+                for weight_name in group.attrs['weight_names']:
+                    weight_name = weight_name.decode() if isinstance(weight_name, bytes) else weight_name
+                    short = weight_name.rsplit('/', 1)[-1].split(':')[0]
+                    stored[short] = np.asarray(group[weight_name], dtype=np.float32)
+                for short in WEIGHT_NAMES[kind]:
+                    if short in stored:
+                        arrays[f'{index}/{short}'] = stored[short]
+
+    config = {'layers': layers, 'input_shape': input_shape, 'source': str(h5_path)}
+    with open(out_path, 'wb') as out:
+        np.savez(out, config=np.array(json.dumps(config)), **arrays)
+    return config
+
+
+def check_parity(h5_path, npz_path, samples=4, seed=0):
+    """Largest absolute difference between Keras and NumpyCNN on random images"""
+    import tensorflow as tf
+
+    keras_model = tf.keras.models.load_model(h5_path, compile=False)
+    cnn = NumpyCNN.load(npz_path)
+    rng = np.random.default_rng(seed)
+    batch = rng.integers(0, 256, size=(samples, *cnn.input_shape)).astype(np.float32)
+    expected = keras_model.predict(batch, verbose=0)
+    actual = cnn.predict(batch)
+    return float(np.max(np.abs(expected - actual)))
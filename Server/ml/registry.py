@@ -0,0 +1,188 @@
+"""
+Process-wide model registry.
+
+Each model is loaded once (at startup or on first use) and kept in memory.
+When its file in `Ml Models/` changes the new artifact is loaded on a
+background thread and swapped in atomically once it is ready, so requests
+never pay the load cost and deploys don't need a restart.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from ml import settings, startup
+
+
+# Immutable snapshot of a loaded model; replaced as a whole on reload. `stat`
+# is the (mtime, size) of the model file and of each of its sources.
+LoadedModel = namedtuple('LoadedModel', ['model', 'version', 'loaded_at', 'load_seconds', 'stat'])
+
+
+def file_version(path):
+    """Short content hash used as the model version"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelEntry:
+    def __init__(self, name, filename, loader, model_dir, requires=(), fork_safe=True, sources=()):
+        self.name = name
+        self.filename = filename
+        self.loader = loader
+        self.requires = requires
+        self.fork_safe = fork_safe
+        self.path = os.path.join(model_dir, filename)
+        self.sources = [os.path.join(model_dir, source) for source in sources]
+        self.current = None
+        self.last_check = 0.0
+        self.last_error = None
+        self.reloading = False
+        self.lock = threading.Lock()
+
+    def _stat(self):
+        st = os.stat(self.path)
+        stat = [(st.st_mtime, st.st_size)]
+        for source in self.sources:
+            # A source may be missing; it only matters when it changes
+            try:
+                st = os.stat(source)
+                stat.append((st.st_mtime, st.st_size))
+            except FileNotFoundError:
+                stat.append(None)
+        return tuple(stat)
+
+    def load(self):
+        """
+        Load the artifact from disk and swap it in. Returns the current model
+        and whether this call swapped it in, so only one thread reports a load.
+        """
+        with self.lock:
+            stat = self._stat()
+            if self.current is not None and self.current.stat == stat:
+                return self.current, False
+            # Imported first so load_seconds only covers reading the artifact
+            for module in self.requires:
+                startup.import_module(module)
+            start = time.perf_counter()
+            model = self.loader(self.path)
+            elapsed = time.perf_counter() - start
+            # Artifacts carry their own version; other files are versioned by content,
+            # including a source the loader served instead of the registered file
+            manifest = getattr(model, 'manifest', None)
+            version = manifest['version'] if manifest else file_version(getattr(model, 'source_path', self.path))
+            self.current = LoadedModel(model, version, time.time(), elapsed, stat)
+            self.last_error = None
+            return self.current, True
+
+    def is_stale(self, now, interval):
+        if interval <= 0 or now - self.last_check < interval:
+            return False
+        self.last_check = now
+        try:
+            return self._stat() != self.current.stat
+        except OSError:
+            # File is being replaced; keep serving the current model
+            return False
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=None, reload_interval=None):
+        self.model_dir = model_dir or settings.MODEL_DIR
+        self.reload_interval = settings.MODEL_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self._entries = {}
+        self._listeners = []
+
+    def register(self, name, filename, loader, requires=(), fork_safe=True, sources=()):
+        """
+        Register a model file with the function used to load it and the modules
+        it needs; `fork_safe=False` marks a model that can't be loaded before
+        fork(), and a change to one of `sources` (files the model is built
+        from) reloads it like a change to the file itself
+        """
+        self._entries[name] = ModelEntry(name, filename, loader, self.model_dir, requires, fork_safe, sources)
+
+    def on_reload(self, callback):
+        """Call `callback(name, loaded)` whenever a model is (re)loaded"""
+        self._listeners.append(callback)
+
+    def _reload_in_background(self, entry):
+        def run():
+            try:
+                self._load(entry)
+            except Exception as e:
+                # A half-written or broken artifact must not take the endpoint down
+                entry.last_error = str(e)
+                print(f"⚠️  Reload of {entry.name} failed, keeping version {entry.current.version}: {e}",
+                      file=sys.stderr)
+            finally:
+                entry.reloading = False
+
+        entry.reloading = True
+        threading.Thread(target=run, name=f'reload-{entry.name}', daemon=True).start()
+
+    def _load(self, entry):
+        loaded, changed = entry.load()
+        if changed:
+            for callback in self._listeners:
+                callback(entry.name, loaded)
+        return loaded
+
+    def fork_unsafe(self):
+        """Names of the models registered with fork_safe=False"""
+        return [name for name, entry in self._entries.items() if not entry.fork_safe]
+
+    def load_all(self, names=None, exclude=()):
+        """Load the registered models (all by default); failures are logged and retried lazily"""
+        for name, entry in self._entries.items():
+            if (names is not None and name not in names) or name in exclude:
+                continue
+            try:
+                self._load(entry)
+                print(f"✅ Loaded {entry.name} ({entry.filename}) version {entry.current.version} "
+                      f"in {entry.current.load_seconds:.2f}s", file=sys.stderr)
+            except Exception as e:
+                entry.last_error = str(e)
+                print(f"⚠️  Could not load {entry.name} ({entry.filename}): {e}", file=sys.stderr)
+
+    def get_loaded(self, name):
+        """Return the current LoadedModel, loading or reloading it if needed"""
+        entry = self._entries[name]
+        if entry.current is None:
+            return self._load(entry)
+        if not entry.reloading and entry.is_stale(time.monotonic(), self.reload_interval):
+            self._reload_in_background(entry)
+        return entry.current
+
+    def get(self, name):
+        return self.get_loaded(name).model
+
+    def info(self):
+        """Version and load time of every registered model"""
+        models = {}
+        for name, entry in self._entries.items():
+            loaded = entry.current
+            models[name] = {
+                'file': entry.filename,
+                'loaded': loaded is not None,
+                'version': loaded.version if loaded else None,
+                'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(loaded.loaded_at)) if loaded else None,
+                'load_seconds': round(loaded.load_seconds, 4) if loaded else None,
+                'error': entry.last_error,
+            }
+            manifest = getattr(loaded.model, 'manifest', None) if loaded else None
+            if manifest:
+                models[name]['artifact'] = {
+                    'kind': manifest['kind'],
+                    'data': manifest['data'],
+                    'checksum': manifest['checksum'],
+                    'created_at': manifest['created_at'],
+                    'training': manifest['training'],
+                }
+        return models
@@ -0,0 +1,180 @@
+"""
+Feature schemas for the tabular models.
+
+Single source of truth for the name, order, kind and valid range of every
+feature. `train_all_models.py` builds its training matrices from these and
+`app.py` uses them to validate requests and pack them straight into
+contiguous float arrays.
+"""
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+
+# kind is 'float', 'int' (whole numbers) or 'binary' (0 / 1 flags)
+Feature = namedtuple('Feature', ['name', 'kind', 'low', 'high'])
+
+
+class FeatureSchema:
+    def __init__(self, model, features, dtype=np.float64):
+        self.model = model
+        self.features = tuple(features)
+        self.names = tuple(f.name for f in self.features)
+        self.dtype = np.dtype(dtype)
+        self.lows = np.array([f.low for f in self.features], dtype=self.dtype)
+        self.highs = np.array([f.high for f in self.features], dtype=self.dtype)
+        self.whole = np.array([f.kind in ('int', 'binary') for f in self.features])
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.features)
+
+    def _buffer(self):
+        # One reusable (1, n) row per thread for single-row requests
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.features)), dtype=self.dtype)
+        return buffer
+
+    def _describe(self, j, value):
+        f = self.features[j]
+        if not np.isfinite(value):
+            return f"invalid value for '{f.name}'"
+        if f.kind == 'binary':
+            return f"'{f.name}' must be 0 or 1"
+        if self.whole[j] and value != np.floor(value):
+            return f"'{f.name}' must be a whole number"
+        return f"'{f.name}' must be between {f.low:g} and {f.high:g}"
+
+    def _invalid(self, X):
+        """Boolean mask of values that are non-finite, out of range or not whole"""
+        with np.errstate(invalid='ignore'):
+            bad = ~np.isfinite(X) | (X < self.lows) | (X > self.highs)
+            bad |= self.whole & (X != np.floor(X))
+        return bad
+
+    def pack(self, data):
+        """
+        Validate one JSON object and write it into this thread's (1, n) buffer.
+        The returned array is reused by the next call on the same thread.
+        """
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object of features')
+        row = self._buffer()
+        for j, name in enumerate(self.names):
+            value = data.get(name)
+            if value is None:
+                raise ValueError(f"missing field '{name}'")
+            try:
+                row[0, j] = value
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid value for '{name}'")
+        bad = self._invalid(row[0])
+        if bad.any():
+            j = int(np.argmax(bad))
+            raise ValueError(self._describe(j, row[0, j]))
+        return row
+
+    def pack_rows(self, records):
+        """
+        Validate many `(record, error)` pairs column-wise in one vectorized pass.
+        Returns the contiguous matrix of valid rows, their input indices and
+        a {row: error} map for the rest.
+        """
+        errors = {}
+        objects = []
+        positions = []
+        for i, (record, error) in enumerate(records):
+            if error is None and not isinstance(record, dict):
+                error = 'row must be an object'
+            if error is not None:
+                errors[i] = error
+            else:
+                objects.append(record)
+                positions.append(i)
+
+        n = len(objects)
+        X = np.empty((n, len(self.features)), dtype=self.dtype)
+        missing = np.zeros(X.shape, dtype=bool)
+        for j, name in enumerate(self.names):
+            column = [record.get(name) for record in objects]
+            missing[:, j] = [value is None for value in column]
+            try:
+                X[:, j] = column
+                continue
+            except (TypeError, ValueError):
+                pass
+            # Slow path only for a column holding a bad cell
+            for k, value in enumerate(column):
+                try:
+                    X[k, j] = value
+                except (TypeError, ValueError):
+                    X[k, j] = np.nan
+
+        bad = self._invalid(X)
+        bad_rows = np.flatnonzero(bad.any(axis=1))
+        for k in bad_rows:
+            j = int(np.argmax(bad[k]))
+            if missing[k, j]:
+                errors[positions[k]] = f"missing field '{self.names[j]}'"
+            else:
+                errors[positions[k]] = self._describe(j, X[k, j])
+
+        keep = ~bad.any(axis=1)
+        indices = [positions[k] for k in np.flatnonzero(keep)]
+        return np.ascontiguousarray(X[keep]), indices, errors
+
+    def stack(self, columns):
+        """Build a training matrix from a {name: column} dict in schema order"""
+        first = columns[self.names[0]]
+        X = np.empty((len(first), len(self.features)), dtype=self.dtype)
+        for j, name in enumerate(self.names):
+            X[:, j] = columns[name]
+        return X
+
+
+SCHEMAS = {
+    'diabetes': FeatureSchema('diabetes', [
+        Feature('Pregnancies', 'int', 0, 20),
+        Feature('Glucose', 'float', 0, 400),
+        Feature('BloodPressure', 'float', 0, 250),
+        Feature('SkinThickness', 'float', 0, 100),
+        Feature('Insulin', 'float', 0, 1000),
+        Feature('BMI', 'float', 0, 80),
+        Feature('DiabetesPedigreeFunction', 'float', 0, 3),
+        Feature('Age', 'float', 0, 120),
+    ]),
+    'thyroid': FeatureSchema('thyroid', [
+        Feature('age', 'float', 0, 120),
+        Feature('on_thyroxine', 'binary', 0, 1),
+        Feature('query_on_thyroxine', 'binary', 0, 1),
+        Feature('on_antithyroid_medication', 'binary', 0, 1),
+        Feature('pregnant', 'binary', 0, 1),
+        Feature('thyroid_surgery', 'binary', 0, 1),
+        Feature('tumor', 'binary', 0, 1),
+        Feature('T3', 'float', 0, 15),
+        Feature('TT4', 'float', 0, 500),
+        Feature('T4U', 'float', 0, 3),
+        Feature('FTI', 'float', 0, 500),
+    ]),
+    'breast_cancer': FeatureSchema('breast_cancer', [
+        Feature('radius_mean', 'float', 0, 50),
+        Feature('texture_mean', 'float', 0, 60),
+        Feature('perimeter_mean', 'float', 0, 300),
+        Feature('area_mean', 'float', 0, 4000),
+        Feature('smoothness_mean', 'float', 0, 0.3),
+        Feature('compactness_mean', 'float', 0, 1),
+        Feature('concavity_mean', 'float', 0, 1),
+        Feature('concave_points_mean', 'float', 0, 0.5),
+        Feature('radius_worst', 'float', 0, 60),
+        Feature('texture_worst', 'float', 0, 80),
+        Feature('perimeter_worst', 'float', 0, 400),
+        Feature('area_worst', 'float', 0, 6000),
+        Feature('smoothness_worst', 'float', 0, 0.4),
+        Feature('compactness_worst', 'float', 0, 1.5),
+        Feature('concavity_worst', 'float', 0, 2),
+        Feature('concave_points_worst', 'float', 0, 0.5),
+    ]),
+}
@@ -0,0 +1,81 @@
+"""
+Runtime settings for the Flask ML server.
+Every value can be overridden with an environment variable of the same name.
+"""
+
+import os
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, '') else default
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+# Directory holding the trained model artifacts
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Ml Models'))
+
+# Load every model when the server starts instead of on first request
+PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', '1') != '0'
+
+# How often (seconds) a model file is checked for changes; 0 disables hot reload
+MODEL_RELOAD_INTERVAL = _env_float('MODEL_RELOAD_INTERVAL', 2.0)
+
+# Micro-batching for the X-ray models: how long to wait for more requests,
+# the largest batch run in one forward pass and how many requests may queue
+BATCH_WINDOW_MS = _env_float('BATCH_WINDOW_MS', 5.0)
+BATCH_MAX_SIZE = _env_int('BATCH_MAX_SIZE', 16)
+BATCH_MAX_QUEUE = _env_int('BATCH_MAX_QUEUE', 256)
+
+# Largest accepted X-ray upload; bigger requests are rejected before decoding
+MAX_UPLOAD_BYTES = _env_int('MAX_UPLOAD_BYTES', 20 * 1024 * 1024)
+
+# Runtime for the X-ray CNNs: 'numpy' runs the exported .npz weights without
+# TensorFlow, 'keras' loads the .h5 file, 'auto' prefers the .npz when present
+CNN_RUNTIME = os.environ.get('CNN_RUNTIME', 'auto')
+
+# Run one inference per model at startup (also `python app.py --warmup`)
+WARMUP = os.environ.get('WARMUP', '0') == '1'
+
+# Serve the tabular pipelines as compiled array-backed predictors (ml/compiled.py)
+COMPILE_MODELS = os.environ.get('COMPILE_MODELS', '1') != '0'
+
+# Serve a model from its memory-mapped artifact (ml/artifacts.py) when
+# MODEL_DIR has one, and check the artifact's SHA-256 when it is loaded
+USE_ARTIFACTS = os.environ.get('USE_ARTIFACTS', '1') != '0'
+ARTIFACT_VERIFY = os.environ.get('ARTIFACT_VERIFY', '1') != '0'
+
+# Prediction cache for repeated inputs; either value set to 0 disables it
+CACHE_MAX_ENTRIES = _env_int('CACHE_MAX_ENTRIES', 10000)
+CACHE_TTL = _env_float('CACHE_TTL', 600.0)
+
+# Production serving (serve.py). Request threads read uploads and parse JSON;
+# model code runs on a bounded pool of INFERENCE_THREADS threads, with at most
+# INFERENCE_MAX_PENDING calls waiting before requests are refused.
+HOST = os.environ.get('HOST', '127.0.0.1')
+PORT = _env_int('PORT', 5000)
+SERVER_THREADS = _env_int('SERVER_THREADS', 16)
+INFERENCE_THREADS = _env_int('INFERENCE_THREADS', min(4, os.cpu_count() or 1))
+INFERENCE_MAX_PENDING = _env_int('INFERENCE_MAX_PENDING', 64)
+
+# Threads each inference call may use inside BLAS/OpenMP and TensorFlow, sized
+# so INFERENCE_THREADS * BLAS_THREADS does not exceed the CPU count
+BLAS_THREADS = _env_int('BLAS_THREADS', max(1, (os.cpu_count() or 1) // max(1, INFERENCE_THREADS)))
+
+# Pre-fork server (gunicorn.conf.py): worker processes sharing the models
+# loaded by the master, each recycled after about WORKER_MAX_REQUESTS requests
+# (0 disables) and given WORKER_GRACEFUL_TIMEOUT seconds to finish in-flight
+# requests when it is recycled or the server stops
+WEB_WORKERS = _env_int('WEB_WORKERS', os.cpu_count() or 1)
+WORKER_MAX_REQUESTS = _env_int('WORKER_MAX_REQUESTS', 2000)
+WORKER_MAX_REQUESTS_JITTER = _env_int('WORKER_MAX_REQUESTS_JITTER', 200)
+WORKER_TIMEOUT = _env_int('WORKER_TIMEOUT', 120)
+WORKER_GRACEFUL_TIMEOUT = _env_int('WORKER_GRACEFUL_TIMEOUT', 30)
+
+# Set by gunicorn.conf.py in the master, which imports app.py before forking:
+# models needing TensorFlow are then left for each worker to load after the fork
+PREFORK = False
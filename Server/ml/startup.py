@@ -0,0 +1,71 @@
+"""
+Lazy imports and the startup timing report.
+
+Heavy dependencies (TensorFlow, OpenCV, scikit-learn) are imported through
+`import_module` the first time an endpoint needs them, and every import,
+model load and first inference is timed so cold starts can be measured.
+"""
+
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+PROCESS_START = time.perf_counter()
+
+_lock = threading.Lock()
+_report = {'imports': {}, 'model_load': {}, 'first_inference': {}}
+
+
+def _record(section, key, seconds):
+    with _lock:
+        _report[section].setdefault(key, round(seconds, 4))
+
+
+def import_module(name):
+    """importlib.import_module, timed the first time the module is imported"""
+    module = sys.modules.get(name)
+    # A module another thread is still importing is in sys.modules half-built;
+    # importlib waits for it to finish
+    if module is not None and not getattr(getattr(module, '__spec__', None), '_initializing', False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _record('imports', name, time.perf_counter() - start)
+    return module
+
+
+def record_model_load(name, seconds):
+    _record('model_load', name, seconds)
+
+
+@contextmanager
+def first_inference(name):
+    """Time the block only the first time it runs for `name`"""
+    if name in _report['first_inference']:
+        yield
+        return
+    start = time.perf_counter()
+    yield
+    _record('first_inference', name, time.perf_counter() - start)
+
+
+def report():
+    with _lock:
+        result = {section: dict(values) for section, values in _report.items()}
+    result['uptime_seconds'] = round(time.perf_counter() - PROCESS_START, 3)
+    return result
+
+
+def print_report(ready_seconds):
+    data = report()
+    print(f"\n⏱️  Startup report (ready in {ready_seconds:.2f}s)", file=sys.stderr)
+    for section, title in (('imports', 'Imports'), ('model_load', 'Model load'),
+                           ('first_inference', 'First inference')):
+        print(f"   {title}:", file=sys.stderr)
+        if not data[section]:
+            print("      (none yet)", file=sys.stderr)
+        for key, seconds in data[section].items():
+            print(f"      {key:<28} {seconds * 1000:9.1f} ms", file=sys.stderr)
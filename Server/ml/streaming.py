@@ -0,0 +1,182 @@
+"""
+Out-of-core training for the tabular models.
+
+Trains on files too large to load at once by reading them `chunk_rows` rows
+at a time, so memory is bounded by the chunk size rather than the dataset:
+
+1. one pass fits the StandardScaler with `partial_fit` (running mean and
+   variance),
+2. `epochs` passes fit an SGDClassifier with the logistic loss, one
+   `partial_fit` per chunk, rows shuffled within each chunk,
+3. a last pass scores the held-out rows.
+
+Every HOLDOUT_EVERY-th row is held out for evaluation, so the split is
+deterministic and needs no shuffle of the whole file. Rows with a missing or
+out-of-range feature (by the model's FeatureSchema), or with the wrong number
+of fields, are skipped and counted.
+
+The result is a Pipeline of the same shape as `train_all_models.py`
+produces, and SGD with the log loss compiles to the same CompiledLogistic
+artifact as LogisticRegression, so `app.py` serves it unchanged.
+
+Input is CSV (optionally gzipped, quoted or not) with a header row naming the
+schema's features and a label column, or Parquet when pyarrow is installed.
+"""
+
+import csv
+import gzip
+import hashlib
+import itertools
+import os
+import time
+
+import numpy as np
+
+from ml.schemas import SCHEMAS
+
+
+DEFAULT_CHUNK_ROWS = 100_000
+DEFAULT_LABEL = 'target'
+# Every 5th row is held out, the same 20% as train_all_models.TEST_SIZE
+HOLDOUT_EVERY = 5
+
+
+def _open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, newline='')
+
+
+def _parse_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+def _parse_rows(lines, width, usecols):
+    """
+    Slow path for a chunk NumPy can't parse: blank or non-numeric cells become
+    NaN, and a row with the wrong number of fields is kept as all-NaN so it is
+    counted as skipped and the rows after it keep their index (and holdout)
+    """
+    malformed = [np.nan] * len(usecols)
+    return np.array([[_parse_float(row[i]) for i in usecols] if len(row) == width else malformed
+                     for row in csv.reader(lines) if row], dtype=np.float64).reshape(-1, len(usecols))
+
+
+def _csv_chunks(path, columns, chunk_rows):
+    with _open_text(path) as f:
+        header = [name.strip() for name in next(csv.reader([f.readline()]))]
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f"{os.path.basename(path)} has no column {', '.join(map(repr, missing))}")
+        usecols = [header.index(name) for name in columns]
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            try:
+                # Every column is parsed so a row with a missing or extra field fails here
+                chunk = np.loadtxt(lines, delimiter=',', quotechar='"', dtype=np.float64, ndmin=2)
+                if chunk.shape[1] != len(header):
+                    raise ValueError(f'{chunk.shape[1]} fields, expected {len(header)}')
+                chunk = chunk[:, usecols]
+            except ValueError:
+                chunk = _parse_rows(lines, len(header), usecols)
+            yield chunk
+
+
+def _parquet_chunks(path, columns, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Reading Parquet needs pyarrow (pip install pyarrow)')
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+        yield np.column_stack([batch.column(name).to_numpy(zero_copy_only=False).astype(np.float64)
+                               for name in columns])
+
+
+def iter_chunks(path, columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(rows, len(columns)) float64 arrays of `columns`, in file order"""
+    if path.endswith('.parquet'):
+        return _parquet_chunks(path, columns, chunk_rows)
+    return _csv_chunks(path, columns, chunk_rows)
+
+
+def file_digest(path, block=1 << 20):
+    """SHA-256 of a data file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(block), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class Stream:
+    """Valid (X, y, held out) chunks of one model's data file"""
+
+    def __init__(self, name, path, label=DEFAULT_LABEL, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.schema = SCHEMAS[name]
+        self.path = path
+        self.label = label
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.skipped = 0
+
+    def __iter__(self):
+        rows = skipped = 0
+        for chunk in iter_chunks(self.path, self.schema.names + (self.label,), self.chunk_rows):
+            X, y = chunk[:, :-1], chunk[:, -1]
+            holdout = (np.arange(rows, rows + len(chunk)) % HOLDOUT_EVERY) == 0
+            rows += len(chunk)
+            valid = ~self.schema._invalid(X).any(axis=1) & np.isfinite(y)
+            skipped += int(np.count_nonzero(~valid))
+            yield X[valid], y[valid], holdout[valid]
+        self.rows, self.skipped = rows, skipped
+
+
+def fit(name, path, label=DEFAULT_LABEL, chunk_rows=DEFAULT_CHUNK_ROWS, epochs=5, alpha=1e-4, seed=42):
+    """Train a StandardScaler + logistic SGDClassifier pipeline on `path`; returns (pipeline, report)"""
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    start = time.perf_counter()
+    stream = Stream(name, path, label, chunk_rows)
+    rng = np.random.default_rng(seed)
+
+    scaler = StandardScaler()
+    classes = set()
+    for X, y, holdout in stream:
+        if np.count_nonzero(~holdout):
+            scaler.partial_fit(X[~holdout])
+            classes.update(np.unique(y[~holdout]).tolist())
+    if not classes:
+        raise ValueError(f'{os.path.basename(path)} has no valid training rows')
+    classes = np.array(sorted(classes))
+    if len(classes) != 2:
+        raise ValueError(f'Expected 2 label values in {label!r}, found {len(classes)}')
+
+    classifier = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    for _ in range(epochs):
+        for X, y, holdout in stream:
+            train = np.flatnonzero(~holdout)
+            if len(train):
+                rng.shuffle(train)
+                classifier.partial_fit(scaler.transform(X[train]), y[train], classes=classes)
+
+    pipeline = Pipeline([('scaler', scaler), ('classifier', classifier)])
+    correct = tested = 0
+    for X, y, holdout in stream:
+        if np.count_nonzero(holdout):
+            correct += int(np.count_nonzero(pipeline.predict(X[holdout]) == y[holdout]))
+            tested += int(np.count_nonzero(holdout))
+
+    return pipeline, {
+        'accuracy': correct / tested if tested else float('nan'),
+        'rows': stream.rows,
+        'skipped': stream.skipped,
+        'tested': tested,
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,150 @@
+"""
+Synthetic inputs for training and benchmarking.
+
+The tabular generators are the ones `train_all_models.py` trains on: each
+returns a feature matrix in FeatureSchema order and the risk-score label,
+and the same seed always gives the same data. `xray_jpegs` makes chest
+X-ray-like JPEG uploads for the image endpoints.
+"""
+
+import numpy as np
+
+from ml.schemas import SCHEMAS
+
+
+def diabetes(n_samples=1000, seed=42):
+    rng = np.random.RandomState(seed)
+    pregnancies = rng.randint(0, 15, n_samples)
+    glucose = rng.normal(120, 30, n_samples).clip(0, 200)
+    blood_pressure = rng.normal(70, 15, n_samples).clip(0, 140)
+    skin_thickness = rng.normal(25, 10, n_samples).clip(0, 100)
+    insulin = rng.normal(100, 80, n_samples).clip(0, 800)
+    bmi = rng.normal(30, 8, n_samples).clip(15, 60)
+    dpf = rng.uniform(0.0, 2.5, n_samples)
+    age = rng.randint(21, 80, n_samples)
+
+    # Target based on risk factors
+    diabetes_risk_score = (
+        (glucose > 140) * 3 +
+        (bmi > 35) * 2 +
+        (age > 45) * 1.5 +
+        (blood_pressure > 85) * 1 +
+        (insulin > 200) * 1.5 +
+        (dpf > 1.0) * 1
+    )
+    X = SCHEMAS['diabetes'].stack({
+        'Pregnancies': pregnancies, 'Glucose': glucose, 'BloodPressure': blood_pressure,
+        'SkinThickness': skin_thickness, 'Insulin': insulin, 'BMI': bmi,
+        'DiabetesPedigreeFunction': dpf, 'Age': age
+    })
+    return X, (diabetes_risk_score > 5).astype(int)
+
+
+def thyroid(n_samples=1000, seed=42):
+    rng = np.random.RandomState(seed)
+    age = rng.randint(18, 80, n_samples)
+    on_thyroxine = rng.choice([0, 1], n_samples, p=[0.7, 0.3])
+    query_on_thyroxine = rng.choice([0, 1], n_samples, p=[0.8, 0.2])
+    on_antithyroid_med = rng.choice([0, 1], n_samples, p=[0.85, 0.15])
+    pregnant = rng.choice([0, 1], n_samples, p=[0.9, 0.1])
+    thyroid_surgery = rng.choice([0, 1], n_samples, p=[0.9, 0.1])
+    tumor = rng.choice([0, 1], n_samples, p=[0.95, 0.05])
+    T3 = rng.normal(1.5, 0.5, n_samples).clip(0.5, 3.5)
+    TT4 = rng.normal(100, 25, n_samples).clip(40, 200)
+    T4U = rng.normal(1.0, 0.2, n_samples).clip(0.5, 2.0)
+    FTI = rng.normal(110, 20, n_samples).clip(50, 200)
+
+    thyroid_risk = (
+        (on_thyroxine == 1) * 2 +
+        (on_antithyroid_med == 1) * 3 +
+        (thyroid_surgery == 1) * 2 +
+        (tumor == 1) * 4 +
+        (T3 > 2.5) * 1.5 +
+        (TT4 > 150) * 1.5 +
+        (T4U > 1.5) * 1
+    )
+    X = SCHEMAS['thyroid'].stack({
+        'age': age, 'on_thyroxine': on_thyroxine, 'query_on_thyroxine': query_on_thyroxine,
+        'on_antithyroid_medication': on_antithyroid_med, 'pregnant': pregnant,
+        'thyroid_surgery': thyroid_surgery, 'tumor': tumor, 'T3': T3, 'TT4': TT4, 'T4U': T4U, 'FTI': FTI
+    })
+    return X, (thyroid_risk > 4).astype(int)
+
+
+def breast_cancer(n_samples=1000, seed=42):
+    rng = np.random.RandomState(seed)
+    radius_mean = rng.normal(14, 3.5, n_samples).clip(6, 30)
+    texture_mean = rng.normal(19, 4, n_samples).clip(10, 40)
+    perimeter_mean = rng.normal(92, 24, n_samples).clip(40, 190)
+    area_mean = rng.normal(655, 350, n_samples).clip(150, 2500)
+    smoothness_mean = rng.normal(0.096, 0.014, n_samples).clip(0.05, 0.16)
+    compactness_mean = rng.normal(0.104, 0.053, n_samples).clip(0.02, 0.35)
+    concavity_mean = rng.normal(0.089, 0.08, n_samples).clip(0, 0.43)
+    concave_points_mean = rng.normal(0.049, 0.039, n_samples).clip(0, 0.2)
+    radius_worst = rng.normal(16, 4.8, n_samples).clip(7, 36)
+    texture_worst = rng.normal(25, 6, n_samples).clip(12, 50)
+    perimeter_worst = rng.normal(107, 33, n_samples).clip(50, 250)
+    area_worst = rng.normal(881, 569, n_samples).clip(180, 4000)
+    smoothness_worst = rng.normal(0.132, 0.023, n_samples).clip(0.07, 0.22)
+    compactness_worst = rng.normal(0.254, 0.157, n_samples).clip(0.03, 1.0)
+    concavity_worst = rng.normal(0.272, 0.209, n_samples).clip(0, 1.25)
+    concave_points_worst = rng.normal(0.115, 0.066, n_samples).clip(0, 0.3)
+
+    # Target based on malignancy indicators
+    cancer_risk = (
+        (radius_worst > 20) * 3 +
+        (area_worst > 1200) * 2.5 +
+        (concavity_worst > 0.4) * 2 +
+        (concave_points_worst > 0.15) * 2 +
+        (compactness_worst > 0.3) * 1.5 +
+        (perimeter_worst > 130) * 1.5
+    )
+    X = SCHEMAS['breast_cancer'].stack({
+        'radius_mean': radius_mean, 'texture_mean': texture_mean,
+        'perimeter_mean': perimeter_mean, 'area_mean': area_mean,
+        'smoothness_mean': smoothness_mean, 'compactness_mean': compactness_mean,
+        'concavity_mean': concavity_mean, 'concave_points_mean': concave_points_mean,
+        'radius_worst': radius_worst, 'texture_worst': texture_worst,
+        'perimeter_worst': perimeter_worst, 'area_worst': area_worst,
+        'smoothness_worst': smoothness_worst, 'compactness_worst': compactness_worst,
+        'concavity_worst': concavity_worst, 'concave_points_worst': concave_points_worst
+    })
+    return X, (cancer_risk > 6).astype(int)
+
+
+GENERATORS = {
+    'diabetes': diabetes,
+    'thyroid': thyroid,
+    'breast_cancer': breast_cancer,
+}
+
+
+def records(name, n_samples=1000, seed=0):
+    """Generated rows as request JSON objects, rounded where the schema wants whole numbers"""
+    schema = SCHEMAS[name]
+    X, _ = GENERATORS[name](n_samples, seed)
+    X = np.where(schema.whole, np.round(X), X).clip(schema.lows, schema.highs)
+    return [dict(zip(schema.names, map(float, row))) for row in X]
+
+
+def xray_image(size=1024, seed=0):
+    """Grayscale chest-like image: dark lung fields in a brighter body, plus noise"""
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:size, 0:size] / size
+    image = 170 - 60 * ((x - 0.5) ** 2 + (y - 0.55) ** 2)
+    for cx in (0.33, 0.67):
+        lung = ((x - cx) / 0.15) ** 2 + ((y - 0.5) / 0.3) ** 2 < 1
+        image[lung] -= 90 + 20 * rng.rand()
+    # Ribs
+    image += 15 * (np.sin(y * 60 + rng.rand() * 6) > 0.6)
+    image += rng.normal(0, 12, image.shape)
+    return image.clip(0, 255).astype(np.uint8)
+
+
+def xray_jpegs(count, size=1024, seed=0, quality=90):
+    """`count` distinct JPEG-encoded synthetic X-rays"""
+    from ml import imaging
+
+    cv2 = imaging.cv2()
+    return [cv2.imencode('.jpg', xray_image(size, seed + i), [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+            for i in range(count)]
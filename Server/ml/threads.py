@@ -0,0 +1,34 @@
+"""
+Thread counts for the native libraries under the inference pool.
+
+NumPy's BLAS, OpenMP, TensorFlow and OpenCV each start their own thread pool
+sized to the CPU count. With several inference threads and request threads
+on top, that oversubscribes the CPU, so `configure` caps them to
+settings.BLAS_THREADS (OpenCV to one thread, since decodes already run in
+parallel on the request threads). It has to run before NumPy is imported;
+values already set in the environment are left alone.
+"""
+
+import os
+import sys
+
+from ml import settings
+
+
+BLAS_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                  'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def configure(blas_threads=None):
+    blas_threads = blas_threads or settings.BLAS_THREADS
+    for name in BLAS_VARIABLES:
+        os.environ.setdefault(name, str(blas_threads))
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(blas_threads))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+    os.environ.setdefault('OPENCV_FOR_THREADS_NUM', '1')
+    if 'numpy' in sys.modules:
+        # Too late for the environment variables; limit the loaded BLAS directly
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(blas_threads)
+    return blas_threads
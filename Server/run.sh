@@ -1,5 +1,5 @@
 #!/bin/bash
 cd "$(dirname "$0")"
 source venv/bin/activate
-python3 app.py
-
+# Models load once in the master; WEB_WORKERS workers share them copy-on-write
+exec gunicorn -c gunicorn.conf.py app:app
@@ -0,0 +1,281 @@
+"""
+Score an archive of chest X-rays offline with the pneumonia and COVID models.
+
+Reads every image in a directory (recursively), a .zip or a tar archive.
+Images are decoded once, at the scale the largest model input needs, and
+resized for each model on a thread pool, which works on the next batch while
+the current one runs through the models. Results are appended to a CSV or
+NDJSON file (by extension) after every batch; rerunning the same command
+skips the images already scored in it, so an interrupted run resumes where it
+stopped. Images that can't be read are written with an error instead of
+probabilities and are tried again on the next run; the last row for an image
+is its result.
+
+The models are loaded the same way as in app.py (artifact, .npz or .h5,
+per CNN_RUNTIME), and each row records the model versions that scored it.
+
+Usage (from Server/):
+    python score_xrays.py /data/xrays results.csv [--models pneumonia,covid] [--batch-size 32] [--threads N]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ml import settings, threads
+
+# The models run on this thread one batch at a time, so BLAS may use every core
+threads.configure(os.cpu_count() or 1)
+
+import numpy as np  # noqa: E402
+
+from ml import artifacts, imaging, startup  # noqa: E402
+from ml.numpy_cnn import NumpyCNN  # noqa: E402
+from ml.registry import file_version  # noqa: E402
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+# Output column reported as each model's probability, as in app.py
+PROBABILITY_INDEX = {'pneumonia': 1, 'covid': 0}
+
+
+def load_model(model_dir, name):
+    """(model, version) chosen like app.register_cnn: artifact, then .npz, then .h5"""
+    h5_file = artifacts.CNN_SOURCES[name]
+    npz_path = os.path.join(model_dir, os.path.splitext(h5_file)[0] + '.npz')
+    manifest_path = os.path.join(model_dir, artifacts.manifest_file(name))
+    if settings.CNN_RUNTIME != 'keras' and settings.USE_ARTIFACTS and os.path.exists(manifest_path):
+        model = artifacts.load(manifest_path)
+        return model, model.manifest['version']
+    if settings.CNN_RUNTIME == 'numpy' or (settings.CNN_RUNTIME == 'auto' and os.path.exists(npz_path)):
+        return NumpyCNN.load(npz_path), file_version(npz_path)
+    h5_path = os.path.join(model_dir, h5_file)
+    tf = startup.import_module('tensorflow')
+    return tf.keras.models.load_model(h5_path, compile=False), file_version(h5_path)
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def iter_images(source, skip=()):
+    """
+    Yield (name, read) for every image in `source` not in `skip`, in a stable
+    order; `read()` returns the encoded bytes and may run on another thread
+    """
+    def wanted(name):
+        return name.lower().endswith(IMAGE_EXTENSIONS) and name not in skip
+
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, source)
+                if wanted(name):
+                    yield name, partial(_read_file, path)
+    # Archive members are read here, in order: the archive is closed when this
+    # generator ends, and compressed tars can only be read front to back
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in sorted(archive.infolist(), key=lambda info: info.filename):
+                if not info.is_dir() and wanted(info.filename):
+                    yield info.filename, partial(bytes, archive.read(info))
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, 'r:*') as archive:
+            for member in archive:
+                if member.isfile() and wanted(member.name):
+                    data = archive.extractfile(member).read()
+                    yield member.name, partial(bytes, data)
+    else:
+        raise ValueError(f'{source} is not a directory, .zip or tar archive')
+
+
+def prepare(read, sizes):
+    """Runs on the decode pool: encoded image -> one resized array per model"""
+    start = time.perf_counter()
+    data = np.frombuffer(read(), np.uint8)
+    images = imaging.decode_resized(data, sizes)
+    return images, time.perf_counter() - start
+
+
+class Results:
+    """Append-only CSV or NDJSON results file that remembers which images it has scored"""
+
+    def __init__(self, path, names):
+        self.path = path
+        self.csv = path.lower().endswith('.csv')
+        self.fields = ['path'] + list(names) + ['model_version', 'error']
+        self.done, self.failed = self._recover()
+        self.file = open(path, 'a', newline='')
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, self.fields)
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+
+    def _recover(self):
+        """
+        (paths scored, paths whose last row is an error); a last line cut off
+        by an interruption is dropped
+        """
+        if not os.path.exists(self.path):
+            return set(), set()
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            end = content.rfind(b'\n') + 1
+            if end != len(content):
+                f.truncate(end)
+        text = content[:end].decode('utf-8')
+        if self.csv:
+            reader = csv.DictReader(io.StringIO(text, newline=''))
+            if reader.fieldnames and reader.fieldnames != self.fields:
+                raise ValueError(f"{self.path} has columns {', '.join(reader.fieldnames)}; "
+                                 f"use the same --models or another output file")
+            rows = list(reader)
+        else:
+            rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        # A retried image appends a new row, which supersedes the earlier error
+        errors = {row['path']: bool(row.get('error')) for row in rows}
+        return ({path for path, error in errors.items() if not error},
+                {path for path, error in errors.items() if error})
+
+    def write(self, rows):
+        for row in rows:
+            if self.csv:
+                self.writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row) + '\n')
+        # A batch is on disk before the next one starts, so a rerun resumes after it
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Scorer:
+    def __init__(self, models, batch_size, threads, progress_seconds=5.0):
+        self.models = models
+        self.names = list(models)
+        self.sizes = [imaging.CNN_INPUT_SIZES[name] for name in self.names]
+        self.model_version = ';'.join(f'{name}@{version}' for name, (_, version) in models.items())
+        self.batch_size = batch_size
+        self.threads = threads
+        self.progress_seconds = progress_seconds
+        self.scored = 0
+        self.errors = 0
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.predict_seconds = 0.0
+
+    def _run_batch(self, batch, results):
+        rows = []
+        ready = []
+        start = time.perf_counter()
+        for name, future in batch:
+            try:
+                images, seconds = future.result()
+            except Exception as e:
+                rows.append({'path': name, 'model_version': self.model_version, 'error': str(e) or type(e).__name__})
+                self.errors += 1
+                continue
+            self.decode_seconds += seconds
+            row = {'path': name, 'model_version': self.model_version, 'error': ''}
+            rows.append(row)
+            ready.append((row, images))
+        self.wait_seconds += time.perf_counter() - start
+
+        if ready:
+            start = time.perf_counter()
+            for k, model_name in enumerate(self.names):
+                model = self.models[model_name][0]
+                outputs = model.predict(np.stack([images[k] for _, images in ready]), verbose=0)
+                for (row, _), output in zip(ready, outputs):
+                    row[model_name] = round(float(output[PROBABILITY_INDEX[model_name]]), 6)
+            self.predict_seconds += time.perf_counter() - start
+            self.scored += len(ready)
+        results.write(rows)
+
+    def run(self, images, results):
+        start = last_report = time.perf_counter()
+        pending = deque()
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='decode') as pool:
+            def run_next_batch():
+                batch = [pending.popleft() for _ in range(min(self.batch_size, len(pending)))]
+                self._run_batch(batch, results)
+
+            for name, read in images:
+                pending.append((name, pool.submit(prepare, read, self.sizes)))
+                # One batch runs through the models while the next one is decoded
+                if len(pending) >= 2 * self.batch_size:
+                    run_next_batch()
+                    now = time.perf_counter()
+                    if now - last_report >= self.progress_seconds:
+                        last_report = now
+                        done = self.scored + self.errors
+                        print(f"⏳ {done} images, {done / (now - start):.1f} images/s", file=sys.stderr)
+            while pending:
+                run_next_batch()
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a directory or archive of X-rays with the CNN models')
+    parser.add_argument('source', help='directory, .zip or tar archive of images')
+    parser.add_argument('output', help='results file, .csv or .ndjson; appended to and resumed')
+    parser.add_argument('--models', default=','.join(imaging.CNN_INPUT_SIZES),
+                        help='comma-separated models to run')
+    parser.add_argument('--batch-size', type=int, default=32, help='images per forward pass')
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1, help='decode threads')
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help='directory holding the models')
+    args = parser.parse_args()
+
+    names = args.models.split(',')
+    unknown = set(names) - set(imaging.CNN_INPUT_SIZES)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+    if args.batch_size < 1 or args.threads < 1:
+        parser.error('--batch-size and --threads must be at least 1')
+
+    imaging.cv2()
+    models = {}
+    for name in names:
+        models[name] = load_model(args.model_dir, name)
+        print(f"✅ Loaded {name} version {models[name][1]}")
+
+    try:
+        results = Results(args.output, names)
+    except ValueError as e:
+        parser.error(str(e))
+    if results.done or results.failed:
+        print(f"↩️  Resuming: {len(results.done)} images already scored in {args.output}, "
+              f"retrying {len(results.failed)} that failed")
+
+    scorer = Scorer(models, args.batch_size, args.threads)
+    try:
+        elapsed = scorer.run(iter_images(args.source, results.done), results)
+    except KeyboardInterrupt:
+        print(f"\n⏹️  Interrupted after {scorer.scored + scorer.errors} images; rerun to resume")
+        sys.exit(130)
+    finally:
+        results.close()
+
+    done = scorer.scored + scorer.errors
+    print(f"🎉 Scored {scorer.scored} images ({scorer.errors} errors) in {elapsed:.2f}s: "
+          f"{done / elapsed if elapsed else 0:.1f} images/s")
+    print(f"   decode+resize {scorer.decode_seconds:.2f}s across {args.threads} thread(s), "
+          f"models {scorer.predict_seconds:.2f}s, waiting for decodes {scorer.wait_seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
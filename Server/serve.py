@@ -0,0 +1,34 @@
+"""
+Production server for the Flask ML app.
+
+Runs app.py under waitress instead of Flask's development server. SERVER_THREADS
+request threads accept connections, read uploads and parse JSON, while model
+code runs on the bounded inference pool (INFERENCE_THREADS) with the native
+thread pools capped to BLAS_THREADS each, so the CPU is not oversubscribed.
+
+Usage (from Server/):
+    python serve.py [--warmup]
+"""
+
+from ml import settings, threads
+
+# Must happen before app.py imports NumPy, TensorFlow or OpenCV
+threads.configure()
+
+from waitress import serve  # noqa: E402
+
+from app import app  # noqa: E402
+
+
+if __name__ == '__main__':
+    print(f"🚀 Serving on http://{settings.HOST}:{settings.PORT} with {settings.SERVER_THREADS} request threads, "
+          f"{settings.INFERENCE_THREADS} inference threads x {settings.BLAS_THREADS} BLAS threads")
+    serve(
+        app,
+        host=settings.HOST,
+        port=settings.PORT,
+        threads=settings.SERVER_THREADS,
+        # Uploads are at most MAX_UPLOAD_BYTES; let waitress buffer them fully
+        max_request_body_size=settings.MAX_UPLOAD_BYTES + 64 * 1024,
+        connection_limit=max(100, settings.SERVER_THREADS * 8),
+    )
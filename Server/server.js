@@ -10,7 +10,7 @@ const fs = require('fs');
 require('dotenv').config({ path: './config.env' });
 
 // Import AI-based urgency analyzer
-const { analyzeUrgencyWithAI, fallbackAnalysis } = require('./AI_Urgency/urgencyAnalyzer');
+const { analyzeUrgencyWithAI, checkAIHealth, getAIMetrics, startAIWorker, fallbackAnalysis } = require('./AI_Urgency/urgencyAnalyzer');
 
 const app = express();
 const PORT = 3001;
@@ -37,6 +37,11 @@ mongoose.connect(DB, { useNewUrlParser: true, useUnifiedTopology: true })
   // ============================================================
   // Toggle between AI and hardcoded analysis
   const USE_AI_ANALYSIS = true; // Set to false to use hardcoded keyword matching
+
+  // Load the AI model once at startup instead of on the first transcript
+  if (USE_AI_ANALYSIS) {
+    startAIWorker();
+  }
   
   // ============================================================
   // OLD HARDCODED SENTIMENT ANALYSIS (COMMENTED - KEPT AS BACKUP)
@@ -354,6 +359,22 @@ app.get('/emergency-ranking', async (req, res) => {
   }
 });
 
+// Health of the persistent Python AI urgency worker
+app.get('/ai-health', async (req, res) => {
+  const health = await checkAIHealth();
+  res.status(health.status === 'ok' ? 200 : 503).json(health);
+});
+
+// Urgency analyzer stage latencies (classify, detect_symptoms, recommend, ...) for Prometheus
+app.get('/ai-metrics', async (req, res) => {
+  try {
+    const text = await getAIMetrics();
+    res.status(200).type('text/plain; version=0.0.4').send(text);
+  } catch (error) {
+    res.status(503).type('text/plain').send(`# AI worker unavailable: ${error.message}\n`);
+  }
+});
+
 app.listen(PORT, () => {
   console.log(`Server running on port ${PORT}`);
 });
\ No newline at end of file
@@ -1,261 +1,321 @@
 """
 Train all ML models with proper datasets and save them
 This script will:
-1. Download/use standard medical datasets
+1. Generate the synthetic datasets (ml/synthetic.py)
 2. Train models with current scikit-learn version (1.6.1)
 3. Ensure models return probabilities correctly
 4. Match the exact features from your frontend forms
+
+Independent models train concurrently, one process each, and the random
+forests fit their trees in parallel on the cores left over. Every model's
+training data, hyperparameters and scikit-learn version are hashed, and a
+model whose hash matches the one recorded for its artifact in
+`Ml Models/training.json` is skipped, so a rerun only retrains what changed.
+Each model is saved both as a pickled pipeline and as the memory-mapped
+artifact the server loads (ml/artifacts.py).
+
+`--data name=file.csv` trains that model out of core on a real dataset
+instead (ml/streaming.py): the file is read in `--chunk-rows` chunks and a
+logistic SGD model is fitted incrementally, so memory stays bounded however
+large the file is. The file's checksum is part of the training hash.
+
+Usage (from Server/):
+    python train_all_models.py [--force] [--only diabetes,thyroid] [--jobs N]
+    python train_all_models.py --data diabetes=registry.csv.gz [--label Outcome] [--chunk-rows N] [--epochs N]
 """
 
+import argparse
+import hashlib
+import json
+import os
 import pickle
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
+import time
 import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import sklearn
+
+from ml import artifacts, settings, streaming, synthetic
+from ml.registry import file_version
+from ml.schemas import SCHEMAS
+
 warnings.filterwarnings('ignore')
 
-print("🚀 Starting model training...")
-print("=" * 60)
-
-# ============================================================================
-# 1. DIABETES MODEL
-# ============================================================================
-print("\n📊 Training Diabetes Model...")
-print("-" * 60)
-
-try:
-    np.random.seed(42)
-    n_samples = 1000
-    
-    # Create realistic diabetes dataset
-    pregnancies = np.random.randint(0, 15, n_samples)
-    glucose = np.random.normal(120, 30, n_samples).clip(0, 200)
-    blood_pressure = np.random.normal(70, 15, n_samples).clip(0, 140)
-    skin_thickness = np.random.normal(25, 10, n_samples).clip(0, 100)
-    insulin = np.random.normal(100, 80, n_samples).clip(0, 800)
-    bmi = np.random.normal(30, 8, n_samples).clip(15, 60)
-    dpf = np.random.uniform(0.0, 2.5, n_samples)
-    age = np.random.randint(21, 80, n_samples)
-    
-    # Create target based on risk factors
-    diabetes_risk_score = (
-        (glucose > 140) * 3 +
-        (bmi > 35) * 2 +
-        (age > 45) * 1.5 +
-        (blood_pressure > 85) * 1 +
-        (insulin > 200) * 1.5 +
-        (dpf > 1.0) * 1
-    )
-    outcome = (diabetes_risk_score > 5).astype(int)
-    
-    X_diabetes = np.column_stack([pregnancies, glucose, blood_pressure, skin_thickness, 
-                                   insulin, bmi, dpf, age])
-    y_diabetes = outcome
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_diabetes, y_diabetes, test_size=0.2, random_state=42
-    )
-    
-    # Train model with pipeline (includes scaling)
-    diabetes_pipeline = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', LogisticRegression(random_state=42, max_iter=1000))
-    ])
-    
-    diabetes_pipeline.fit(X_train, y_train)
-    accuracy = diabetes_pipeline.score(X_test, y_test)
-    
-    # Test predictions
-    test_low = [[1, 90, 65, 20, 50, 22, 0.3, 25]]  # Low risk
-    test_high = [[6, 180, 95, 35, 250, 38, 1.8, 60]]  # High risk
-    
-    pred_low = diabetes_pipeline.predict_proba(test_low)[0][1]
-    pred_high = diabetes_pipeline.predict_proba(test_high)[0][1]
-    
-    print(f"✅ Diabetes Model Trained!")
-    print(f"   Accuracy: {accuracy*100:.2f}%")
-    print(f"   Test - Low risk: {pred_low*100:.1f}%")
-    print(f"   Test - High risk: {pred_high*100:.1f}%")
-    
-    # Save model
-    with open('./Ml Models/diabetes.pkl', 'wb') as f:
-        pickle.dump(diabetes_pipeline, f)
-    print("   ✓ Saved: diabetes.pkl")
-    
-except Exception as e:
-    print(f"❌ Error training Diabetes model: {e}")
-
-# ============================================================================
-# 2. THYROID MODEL
-# ============================================================================
-print("\n🦋 Training Thyroid Model...")
-print("-" * 60)
-
-try:
-    np.random.seed(42)
-    n_samples = 1000
-    
-    # Create features
-    age = np.random.randint(18, 80, n_samples)
-    on_thyroxine = np.random.choice([0, 1], n_samples, p=[0.7, 0.3])
-    query_on_thyroxine = np.random.choice([0, 1], n_samples, p=[0.8, 0.2])
-    on_antithyroid_med = np.random.choice([0, 1], n_samples, p=[0.85, 0.15])
-    pregnant = np.random.choice([0, 1], n_samples, p=[0.9, 0.1])
-    thyroid_surgery = np.random.choice([0, 1], n_samples, p=[0.9, 0.1])
-    tumor = np.random.choice([0, 1], n_samples, p=[0.95, 0.05])
-    T3 = np.random.normal(1.5, 0.5, n_samples).clip(0.5, 3.5)
-    TT4 = np.random.normal(100, 25, n_samples).clip(40, 200)
-    T4U = np.random.normal(1.0, 0.2, n_samples).clip(0.5, 2.0)
-    FTI = np.random.normal(110, 20, n_samples).clip(50, 200)
-    
-    # Create target
-    thyroid_risk = (
-        (on_thyroxine == 1) * 2 +
-        (on_antithyroid_med == 1) * 3 +
-        (thyroid_surgery == 1) * 2 +
-        (tumor == 1) * 4 +
-        (T3 > 2.5) * 1.5 +
-        (TT4 > 150) * 1.5 +
-        (T4U > 1.5) * 1
-    )
-    disease = (thyroid_risk > 4).astype(int)
-    
-    X_thyroid = np.column_stack([age, on_thyroxine, query_on_thyroxine, on_antithyroid_med,
-                                  pregnant, thyroid_surgery, tumor, T3, TT4, T4U, FTI])
-    y_thyroid = disease
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_thyroid, y_thyroid, test_size=0.2, random_state=42
-    )
-    
-    thyroid_pipeline = Pipeline([
-        ('scaler', StandardScaler()),
-        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
-    ])
-    
-    thyroid_pipeline.fit(X_train, y_train)
-    accuracy = thyroid_pipeline.score(X_test, y_test)
-    
-    # Test predictions
-    test_low = [[30, 0, 0, 0, 0, 0, 0, 1.2, 95, 0.9, 105]]  # Low risk
-    test_high = [[55, 1, 1, 1, 0, 1, 0, 3.0, 170, 1.7, 180]]  # High risk
-    
-    pred_low = thyroid_pipeline.predict_proba(test_low)[0][1]
-    pred_high = thyroid_pipeline.predict_proba(test_high)[0][1]
-    
-    print(f"✅ Thyroid Model Trained!")
-    print(f"   Accuracy: {accuracy*100:.2f}%")
-    print(f"   Test - Low risk: {pred_low*100:.1f}%")
-    print(f"   Test - High risk: {pred_high*100:.1f}%")
-    
-    with open('./Ml Models/thyroid_model.pkl', 'wb') as f:
-        pickle.dump(thyroid_pipeline, f)
-    print("   ✓ Saved: thyroid_model.pkl")
-    
-except Exception as e:
-    print(f"❌ Error training Thyroid model: {e}")
-
-# ============================================================================
-# 3. BREAST CANCER MODEL
-# ============================================================================
-print("\n🎀 Training Breast Cancer Model...")
-print("-" * 60)
-
-try:
-    np.random.seed(42)
-    n_samples = 1000
-    
-    # Generate realistic breast cancer features
-    radius_mean = np.random.normal(14, 3.5, n_samples).clip(6, 30)
-    texture_mean = np.random.normal(19, 4, n_samples).clip(10, 40)
-    perimeter_mean = np.random.normal(92, 24, n_samples).clip(40, 190)
-    area_mean = np.random.normal(655, 350, n_samples).clip(150, 2500)
-    smoothness_mean = np.random.normal(0.096, 0.014, n_samples).clip(0.05, 0.16)
-    compactness_mean = np.random.normal(0.104, 0.053, n_samples).clip(0.02, 0.35)
-    concavity_mean = np.random.normal(0.089, 0.08, n_samples).clip(0, 0.43)
-    concave_points_mean = np.random.normal(0.049, 0.039, n_samples).clip(0, 0.2)
-    radius_worst = np.random.normal(16, 4.8, n_samples).clip(7, 36)
-    texture_worst = np.random.normal(25, 6, n_samples).clip(12, 50)
-    perimeter_worst = np.random.normal(107, 33, n_samples).clip(50, 250)
-    area_worst = np.random.normal(881, 569, n_samples).clip(180, 4000)
-    smoothness_worst = np.random.normal(0.132, 0.023, n_samples).clip(0.07, 0.22)
-    compactness_worst = np.random.normal(0.254, 0.157, n_samples).clip(0.03, 1.0)
-    concavity_worst = np.random.normal(0.272, 0.209, n_samples).clip(0, 1.25)
-    concave_points_worst = np.random.normal(0.115, 0.066, n_samples).clip(0, 0.3)
-    
-    # Create target based on malignancy indicators
-    cancer_risk = (
-        (radius_worst > 20) * 3 +
-        (area_worst > 1200) * 2.5 +
-        (concavity_worst > 0.4) * 2 +
-        (concave_points_worst > 0.15) * 2 +
-        (compactness_worst > 0.3) * 1.5 +
-        (perimeter_worst > 130) * 1.5
-    )
-    diagnosis = (cancer_risk > 6).astype(int)
-    
-    X_cancer = np.column_stack([
-        radius_mean, texture_mean, perimeter_mean, area_mean,
-        smoothness_mean, compactness_mean, concavity_mean, concave_points_mean,
-        radius_worst, texture_worst, perimeter_worst, area_worst,
-        smoothness_worst, compactness_worst, concavity_worst, concave_points_worst
-    ])
-    y_cancer = diagnosis
-    
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_cancer, y_cancer, test_size=0.2, random_state=42
-    )
-    
-    cancer_pipeline = Pipeline([
+
+TRAINING_LOG = 'training.json'
+
+# Everything that decides what a model learns, plus how it is reported
+ModelSpec = namedtuple('ModelSpec', ['title', 'icon', 'filename', 'classifier', 'params', 'checks'])
+
+SPECS = {
+    'diabetes': ModelSpec(
+        'Diabetes', '📊', 'diabetes.pkl', 'logistic_regression', {'random_state': 42, 'max_iter': 1000},
+        {'Low risk': [1, 90, 65, 20, 50, 22, 0.3, 25],
+         'High risk': [6, 180, 95, 35, 250, 38, 1.8, 60]}),
+    'thyroid': ModelSpec(
+        'Thyroid', '🦋', 'thyroid_model.pkl', 'random_forest', {'n_estimators': 100, 'random_state': 42},
+        {'Low risk': [30, 0, 0, 0, 0, 0, 0, 1.2, 95, 0.9, 105],
+         'High risk': [55, 1, 1, 1, 0, 1, 0, 3.0, 170, 1.7, 180]}),
+    'breast_cancer': ModelSpec(
+        'Breast Cancer', '🎀', 'Breast_Cancer_Model.pkl', 'random_forest', {'n_estimators': 100, 'random_state': 42},
+        {'Benign': [11, 16, 70, 380, 0.08, 0.06, 0.02, 0.01, 12, 19, 75, 420, 0.10, 0.08, 0.03, 0.02],
+         'Malignant': [22, 28, 150, 1800, 0.12, 0.28, 0.40, 0.18, 25, 35, 170, 2200, 0.15, 0.50, 0.70, 0.25]}),
+}
+
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+
+def build_pipeline(spec, n_jobs=None):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if spec.classifier == 'random_forest':
+        classifier = RandomForestClassifier(n_jobs=n_jobs, **spec.params)
+    else:
+        classifier = LogisticRegression(**spec.params)
+    return Pipeline([
         ('scaler', StandardScaler()),
-        ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
+        ('classifier', classifier)
     ])
-    
-    cancer_pipeline.fit(X_train, y_train)
-    accuracy = cancer_pipeline.score(X_test, y_test)
-    
-    # Test predictions
-    test_benign = [[11, 16, 70, 380, 0.08, 0.06, 0.02, 0.01, 
-                    12, 19, 75, 420, 0.10, 0.08, 0.03, 0.02]]  # Benign
-    test_malignant = [[22, 28, 150, 1800, 0.12, 0.28, 0.40, 0.18,
-                      25, 35, 170, 2200, 0.15, 0.50, 0.70, 0.25]]  # Malignant
-    
-    pred_benign = cancer_pipeline.predict_proba(test_benign)[0][1]
-    pred_malignant = cancer_pipeline.predict_proba(test_malignant)[0][1]
-    
-    print(f"✅ Breast Cancer Model Trained!")
-    print(f"   Accuracy: {accuracy*100:.2f}%")
-    print(f"   Test - Benign: {pred_benign*100:.1f}%")
-    print(f"   Test - Malignant: {pred_malignant*100:.1f}%")
-    
-    with open('./Ml Models/Breast_Cancer_Model.pkl', 'wb') as f:
-        pickle.dump(cancer_pipeline, f)
-    print("   ✓ Saved: Breast_Cancer_Model.pkl")
-    
-except Exception as e:
-    print(f"❌ Error training Breast Cancer model: {e}")
-
-# ============================================================================
-# SUMMARY
-# ============================================================================
-print("\n" + "=" * 60)
-print("🎉 Model Training Complete!")
-print("=" * 60)
-print("\n📝 Summary:")
-print("   ✓ diabetes.pkl - Trained and saved")
-print("   ✓ thyroid_model.pkl - Trained and saved")
-print("   ✓ Breast_Cancer_Model.pkl - Trained and saved")
-print("\n⚠️  Note: COVID and Pneumonia models are image-based (.h5 files)")
-print("   They need to be retrained with chest X-ray datasets")
-print("   Current COVID model: Covid2.h5 (should work)")
-print("   Current Pneumonia model: pneumonia_model.h5 (random weights)")
-print("\n✅ All models now use predict_proba() for probability scores")
-print("✅ Models trained with current scikit-learn version (1.6.1)")
-print("✅ Features match your frontend forms exactly")
-print("\n🔄 Next steps:")
-print("   1. Restart Flask server: venv/bin/python3 app.py")
-print("   2. Test each diagnosis in your web app")
-print("   3. You should see varying probabilities now!")
\ No newline at end of file
+
+
+def training_hash(spec, X, y):
+    """Changes whenever retraining could produce a different artifact"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'classifier': spec.classifier,
+        'params': spec.params,
+        'test_size': TEST_SIZE,
+        'split_seed': SPLIT_SEED,
+        'sklearn': sklearn.__version__,
+    }, sort_keys=True).encode())
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()
+
+
+def stream_hash(data_path, options):
+    """training_hash for a model streamed from `data_path`"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'classifier': 'sgd_log_loss',
+        'options': options,
+        'holdout_every': streaming.HOLDOUT_EVERY,
+        'sklearn': sklearn.__version__,
+    }, sort_keys=True).encode())
+    digest.update(streaming.file_digest(data_path).encode())
+    return digest.hexdigest()
+
+
+def save(name, pipeline, path, training):
+    """Write the pickled pipeline and its compiled artifact"""
+    from ml.compiled import compile_pipeline, sample_rows
+
+    # Parallelism is for training only; the server decides its own threads
+    if hasattr(pipeline[-1], 'n_jobs'):
+        pipeline[-1].n_jobs = None
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(pipeline, f)
+    os.replace(path + '.tmp', path)
+
+    artifacts.save(os.path.dirname(path), name, compile_pipeline(pipeline, check_rows=sample_rows(SCHEMAS[name])),
+                   SCHEMAS[name], training=dict(training,
+                                                source=SPECS[name].filename,
+                                                source_version=file_version(path),
+                                                sklearn=sklearn.__version__,
+                                                trained_at=time.strftime('%Y-%m-%dT%H:%M:%S%z')))
+
+
+def train(name, X, y, path, n_jobs, digest):
+    """Runs in a worker process: fit, evaluate and save one model"""
+    from sklearn.model_selection import train_test_split
+
+    start = time.perf_counter()
+    spec = SPECS[name]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
+    # Train model with pipeline (includes scaling)
+    pipeline = build_pipeline(spec, n_jobs)
+    pipeline.fit(X_train, y_train)
+    accuracy = pipeline.score(X_test, y_test)
+    checks = {label: float(pipeline.predict_proba([row])[0][1]) for label, row in spec.checks.items()}
+
+    save(name, pipeline, path, {
+        'hash': digest,
+        'classifier': spec.classifier,
+        'params': spec.params,
+        'accuracy': round(accuracy, 4),
+        'samples': len(X),
+    })
+    return {'accuracy': accuracy, 'checks': checks, 'seconds': time.perf_counter() - start}
+
+
+def train_streaming(name, data_path, path, options, digest):
+    """Runs in a worker process: fit one model out of core on `data_path` and save it"""
+    spec = SPECS[name]
+    pipeline, report = streaming.fit(name, data_path, **options)
+    report['checks'] = {label: float(pipeline.predict_proba([row])[0][1]) for label, row in spec.checks.items()}
+
+    save(name, pipeline, path, {
+        'hash': digest,
+        'classifier': 'sgd_log_loss',
+        'params': options,
+        'data': os.path.abspath(data_path),
+        'accuracy': round(report['accuracy'], 4),
+        'samples': report['rows'] - report['skipped'],
+        'skipped': report['skipped'],
+    })
+    return report
+
+
+def load_log(model_dir):
+    try:
+        with open(os.path.join(model_dir, TRAINING_LOG)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_current(entry, path, digest, name):
+    """The pickle and artifact on disk were trained from exactly this data and configuration"""
+    if entry is None or entry.get('hash') != digest or not os.path.exists(path) \
+            or entry.get('version') != file_version(path):
+        return False
+    try:
+        manifest = artifacts.read_manifest(os.path.join(os.path.dirname(path), artifacts.manifest_file(name)))
+    except (OSError, ValueError):
+        return False
+    return manifest['training'].get('hash') == digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the tabular models, skipping those that are up to date')
+    parser.add_argument('--force', action='store_true', help='retrain even when the artifact is up to date')
+    parser.add_argument('--only', help=f"comma-separated subset of {', '.join(SPECS)}")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='CPU cores to use')
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help='where the artifacts are written')
+    parser.add_argument('--data', action='append', default=[], metavar='NAME=FILE',
+                        help='train NAME out of core on a CSV (.csv, .csv.gz) or Parquet file; repeatable. '
+                             'Without --only, only these models are trained')
+    parser.add_argument('--label', default=streaming.DEFAULT_LABEL, help='label column of the --data files')
+    parser.add_argument('--chunk-rows', type=int, default=streaming.DEFAULT_CHUNK_ROWS,
+                        help='rows read at a time from the --data files')
+    parser.add_argument('--epochs', type=int, default=5, help='passes over the --data files')
+    args = parser.parse_args()
+
+    data = dict(item.split('=', 1) for item in args.data if '=' in item)
+    if len(data) != len(args.data):
+        parser.error('--data expects NAME=FILE')
+    options = {'label': args.label, 'chunk_rows': args.chunk_rows, 'epochs': args.epochs}
+
+    names = args.only.split(',') if args.only else list(SPECS)
+    if data and not args.only:
+        names = list(data)
+    unknown = (set(names) | set(data)) - set(SPECS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    print("🚀 Starting model training...")
+    print("=" * 60)
+    start = time.perf_counter()
+    os.makedirs(args.model_dir, exist_ok=True)
+    log = load_log(args.model_dir)
+
+    todo = {}
+    failed = set()
+    for name in names:
+        spec = SPECS[name]
+        path = os.path.join(args.model_dir, spec.filename)
+        if name in data:
+            X = y = None
+            digest = stream_hash(data[name], options)
+        else:
+            X, y = synthetic.GENERATORS[name]()
+            digest = training_hash(spec, X, y)
+        if not args.force and is_current(log.get(spec.filename), path, digest, name):
+            print(f"\n{spec.icon} {spec.title}: up to date, skipped ({spec.filename})")
+            continue
+        todo[name] = (X, y, path, digest)
+
+    if todo:
+        # One process per model; forests split the remaining cores between their trees
+        workers = max(1, min(len(todo), args.jobs))
+        forests = sum(SPECS[name].classifier == 'random_forest' for name in todo if name not in data)
+        n_jobs = max(1, args.jobs // max(1, min(forests, workers)))
+        print(f"\n⏳ Training {', '.join(todo)} in {workers} process(es), {n_jobs} thread(s) per forest")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for name, (X, y, path, digest) in todo.items():
+                if name in data:
+                    # Forests can't be fitted incrementally, so every streamed model is logistic
+                    print(f"   {SPECS[name].title}: streaming {data[name]} ({args.chunk_rows} rows per chunk)")
+                    futures[pool.submit(train_streaming, name, data[name], path, options, digest)] = name
+                else:
+                    futures[pool.submit(train, name, X, y, path, n_jobs, digest)] = name
+            for future in as_completed(futures):
+                name = futures[future]
+                spec = SPECS[name]
+                X, y, path, digest = todo[name]
+                print(f"\n{spec.icon} {spec.title} Model")
+                print("-" * 60)
+                try:
+                    report = future.result()
+                except Exception as e:
+                    print(f"❌ Error training {spec.title} model: {e}")
+                    failed.add(name)
+                    continue
+                print(f"✅ {spec.title} Model Trained in {report['seconds']:.2f}s!")
+                print(f"   Accuracy: {report['accuracy']*100:.2f}%")
+                if 'rows' in report:
+                    print(f"   Rows: {report['rows']:,} read, {report['skipped']:,} skipped, "
+                          f"{report['tested']:,} held out")
+                for label, probability in report['checks'].items():
+                    print(f"   Test - {label}: {probability*100:.1f}%")
+                print(f"   ✓ Saved: {spec.filename} and {artifacts.manifest_file(name)}")
+                log[spec.filename] = {
+                    'model': name,
+                    'hash': digest,
+                    'version': file_version(path),
+                    'accuracy': round(report['accuracy'], 4),
+                    'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'seconds': round(report['seconds'], 3),
+                }
+                if name in data:
+                    log[spec.filename]['data'] = os.path.abspath(data[name])
+                # Written after every model so an interrupted run keeps what finished
+                with open(os.path.join(args.model_dir, TRAINING_LOG), 'w') as f:
+                    json.dump(log, f, indent=2)
+
+    # ============================================================================
+    # SUMMARY
+    # ============================================================================
+    print("\n" + "=" * 60)
+    print(f"🎉 Model Training Complete in {time.perf_counter() - start:.2f}s!")
+    print("=" * 60)
+    print("\n📝 Summary:")
+    for name in names:
+        spec = SPECS[name]
+        if name in failed:
+            print(f"   ❌ {spec.filename} - Failed")
+        else:
+            print(f"   ✓ {spec.filename} - {'Trained and saved' if name in todo else 'Up to date'}")
+    print("\n⚠️  Note: COVID and Pneumonia models are image-based (.h5 files)")
+    print("   They need to be retrained with chest X-ray datasets")
+    print("   Current COVID model: Covid2.h5 (should work)")
+    print("   Current Pneumonia model: pneumonia_model.h5 (random weights)")
+    print("\n✅ All models now use predict_proba() for probability scores")
+    print(f"✅ Models trained with current scikit-learn version ({sklearn.__version__})")
+    print("✅ Features match your frontend forms exactly")
+    print("\n🔄 Next steps:")
+    print("   1. Restart Flask server: venv/bin/python3 app.py")
+    print("   2. Test each diagnosis in your web app")
+    print("   3. You should see varying probabilities now!")
+
+
+if __name__ == '__main__':
+    main()